@@ -1,29 +1,379 @@
 import sys
 import os
+import atexit
+import threading
+from contextlib import contextmanager
+import orjson
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
-from flask import Flask, jsonify, request
+from psycopg2.pool import ThreadedConnectionPool
+from flask import Flask, request
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import math
-import config as config
+import re
+import datetime
+import functools
+import hashlib
+import itertools
+import time
+try:
+    import redis
+except ImportError:
+    redis = None # Optional; only needed when REDIS_URL is set
+try:
+    import config
+except ImportError:
+    config = None # Deployed without config.py; settings come from the environment only
 
 
-# CORRECT:
-DB_CONNECTION_STRING = os.environ.get("DB_CONNECTION_STRING")
-CONGRESS_GOV_API_KEY = os.environ.get("CONGRESS_GOV_API_KEY")
+# Environment variables win; config.py is the fallback for local runs
+DB_CONNECTION_STRING = os.environ.get("DB_CONNECTION_STRING") or getattr(config, "DB_CONNECTION_STRING", None)
+CONGRESS_GOV_API_KEY = os.environ.get("CONGRESS_GOV_API_KEY") or getattr(config, "CONGRESS_GOV_API_KEY", None)
+# Pool bounds; size DB_POOL_MAX_CONN to (gunicorn workers * threads) and keep the
+# total across all workers under Postgres' max_connections.
+DB_POOL_MIN_CONN = int(os.environ.get("DB_POOL_MIN_CONN", 2))
+DB_POOL_MAX_CONN = int(os.environ.get("DB_POOL_MAX_CONN", 20))
+# When set, cached responses are shared across workers through Redis
+REDIS_URL = os.environ.get("REDIS_URL") or getattr(config, "REDIS_URL", None)
+REDIS_KEY_PREFIX = "api:" # The data scripts delete keys under this prefix after a load
+# Deepest row offset-based pagination may reach; deeper pages must use the cursor
+MAX_VOTES_PAGE_DEPTH = 50_000
+# Largest ?limit= accepted by the donor donations endpoint
+MAX_DONOR_DONATIONS_LIMIT = 500
+# Input limits checked before a request is allowed to borrow a database connection
+SEARCH_NAME_MIN_LENGTH = 2
+SEARCH_NAME_MAX_LENGTH = 100
+# Shorter terms yield no whole trigram, so they match column prefixes through B-tree lookups instead
+SEARCH_TRIGRAM_MIN_LENGTH = 3
+# Letters, digits, spaces and common name punctuation. The term goes into LIKE/ILIKE patterns unescaped,
+# so the wildcards '%' (outside the class) and '_' (inside \w, hence the lookahead) are both refused.
+SEARCH_NAME_PATTERN = re.compile(r"^(?!.*_)[\w\s\-.,&'()]+$")
+BILL_TYPES = frozenset(['hr', 's', 'hjres', 'sjres'])
+SORT_ORDERS = frozenset(['asc', 'desc'])
 # --- App Initialization ---
+def orjson_dumps(obj):
+    """Encodes obj with orjson; dates come out as ISO strings, Decimals via str()."""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NAIVE_UTC)
+
+class ORJSONProvider(JSONProvider):
+    """Routes Flask's own JSON handling (jsonify, dict return values, request.json) through orjson."""
+    def dumps(self, obj, **kwargs):
+        return orjson_dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 # Allow requests from any origin (e.g., your GitHub Pages site)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-# --- Database Connection Helper ---
+def json_rows_sql(query):
+    """Wraps query so Postgres serializes its rows into a JSON array.
+    Casting to text keeps psycopg2 from decoding it back into Python objects."""
+    return f"SELECT COALESCE(json_agg(t), '[]'::json)::text FROM ({query}) t"
+
+DONATION_SUMMARY_SQL = """
+    SELECT DonorName, DonorType, Employer, DonorState, TotalAmount,
+           (TotalAmount / NULLIF(SUM(TotalAmount) OVER (), 0)) * 100 AS Percentage
+    FROM politician_donation_summary
+    WHERE PoliticianID = $1 AND TotalAmount > 0{donor_type_filter}
+    ORDER BY TotalAmount DESC
+"""
+# ?industry= values accepted by the donation summary -> Donors.DonorType
+DONOR_TYPE_FILTERS = {'pac/party': 'PAC/Party', 'individual': 'Individual'}
+
+# --- Prepared Statements ---
+# Fixed-shape hot queries: {name: (argument types, SQL)}. Each pooled connection parses
+# and plans them once, then handlers only send EXECUTE. Requires a session-level
+# connection (direct or session-mode pooler), not a transaction-mode pooler.
+PREPARED_STATEMENTS = {
+    'get_politician': ("int", """
+        SELECT PoliticianID, FirstName, LastName, Party, State, Role, IsActive
+        FROM Politicians
+        WHERE PoliticianID = $1
+    """),
+    # Same expression as idx_politicians_search_trgm: the three columns are one indexed value,
+    # so a search is a single GIN probe and still matches substrings (which a tsvector would not)
+    'search_politicians': ("text", json_rows_sql("""
+        SELECT PoliticianID, FirstName, LastName, Party, State, Role, IsActive
+        FROM Politicians
+        WHERE (COALESCE(LastName, '') || ' ' || COALESCE(FirstName, '') || ' ' || COALESCE(Role, '')) ILIKE $1
+        LIMIT 50
+    """)),
+    # Short terms: each branch matches one of the idx_politicians_*_prefix expressions, so the planner ORs three index scans
+    'search_politicians_prefix': ("text", json_rows_sql("""
+        SELECT PoliticianID, FirstName, LastName, Party, State, Role, IsActive
+        FROM Politicians
+        WHERE lower(LastName) LIKE $1 OR lower(FirstName) LIKE $1 OR lower(Role) LIKE $1
+        LIMIT 50
+    """)),
+    # Same expression as idx_donors_search_trgm
+    'search_donors': ("text", json_rows_sql("""
+        SELECT DonorID, Name, DonorType, Employer, State
+        FROM Donors
+        WHERE (Name || ' ' || COALESCE(Employer, '')) ILIKE $1
+        LIMIT 50
+    """)),
+    # Short terms: same expressions as idx_donors_name_prefix and idx_donors_employer_prefix
+    'search_donors_prefix': ("text", json_rows_sql("""
+        SELECT DonorID, Name, DonorType, Employer, State
+        FROM Donors
+        WHERE lower(Name) LIKE $1 OR lower(Employer) LIKE $1
+        LIMIT 50
+    """)),
+    # Reads the politician_donation_summary materialized view (refreshed by the donations loader)
+    # rather than re-aggregating every Donations row on each request. Percentages depend on the
+    # donor type filter, so the window computes them over the same filtered rows.
+    'donation_summary': ("int", json_rows_sql(DONATION_SUMMARY_SQL.format(donor_type_filter=""))),
+    'donation_summary_by_type': ("int, text", json_rows_sql(DONATION_SUMMARY_SQL.format(donor_type_filter=" AND DonorType = $2"))),
+    # Feeds the "Page X of Y" label on the votes endpoint when the count cache misses
+    'count_politician_votes': ("int", """
+        SELECT COUNT(v.VoteID) FROM Votes v JOIN Bills b ON v.BillID = b.BillID
+        WHERE v.PoliticianID = $1
+    """),
+    'count_politician_votes_by_type': ("int, text", """
+        SELECT COUNT(v.VoteID) FROM Votes v JOIN Bills b ON v.BillID = b.BillID
+        WHERE v.PoliticianID = $1 AND b.bill_type = $2
+    """),
+}
+
+# A donor's full history can run to tens of thousands of rows, so it is streamed
+# row by row (see stream_json_rows) instead of built as one JSON value.
+# Optional ?before= / ?limit= narrow it. 'before' is either a plain date filter or a
+# (Date, DonationID) cursor; DonationID breaks ties between donations on the same day.
+DONOR_DONATIONS_BEFORE_SQL = {None: "", 'date': " AND d.Date < %s", 'cursor': " AND (d.Date, d.DonationID) < (%s, %s)"}
+# {(before_kind, has_limit): sql}
+DONOR_DONATIONS_SQL = {
+    (before_kind, has_limit): f"""
+    SELECT row_to_json(t)::text FROM (
+        SELECT d.DonationID, d.Amount, d.Date, p.PoliticianID, p.FirstName, p.LastName, p.Party, p.State, p.Role
+        FROM Donations d
+        JOIN Politicians p ON d.PoliticianID = p.PoliticianID
+        WHERE d.DonorID = %s{before_sql}
+        ORDER BY d.Date DESC, d.DonationID DESC{" LIMIT %s" if has_limit else ""}
+    ) t
+"""
+    for before_kind, before_sql in DONOR_DONATIONS_BEFORE_SQL.items() for has_limit in (False, True)
+}
+STREAM_BATCH_SIZE = 500
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """A connection that remembers which PREPARED_STATEMENTS have been set up on it."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+def execute_prepared(cur, name, params):
+    """Runs the prepared statement name with params, PREPAREing it on this connection the first time.
+    Statements are prepared one at a time, so one whose objects don't exist yet only fails its own endpoint."""
+    conn = cur.connection
+    if name not in conn.prepared_statements:
+        arg_types, query = PREPARED_STATEMENTS[name]
+        cur.execute(f"PREPARE {name} ({arg_types}) AS {query}") # Session-level: a later rollback doesn't undo it
+        conn.prepared_statements.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders})", params)
+
+# --- Database Connection Helpers ---
+db_pool = None
+db_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises when exhausted; this makes extra requests wait for a free slot instead
+db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONN)
+
+def get_db_pool():
+    """Returns the process-wide connection pool, creating it on first use.
+    Created lazily so each gunicorn worker opens its own sockets after fork."""
+    global db_pool
+    if db_pool is None:
+        with db_pool_lock:
+            if db_pool is None:
+                if not DB_CONNECTION_STRING:
+                    raise Exception("DB_CONNECTION_STRING is not set in the environment or config.py.")
+                db_pool = ThreadedConnectionPool(DB_POOL_MIN_CONN, DB_POOL_MAX_CONN, dsn=DB_CONNECTION_STRING,
+                                                 connection_factory=PreparingConnection)
+    return db_pool
+
+@atexit.register
+def close_db_pool():
+    """Closes every pooled connection so Postgres isn't left holding idle backends after shutdown."""
+    global db_pool
+    with db_pool_lock:
+        if db_pool is not None and not db_pool.closed:
+            db_pool.closeall()
+        db_pool = None
+
+@contextmanager
 def get_db_connection():
-    """Establishes and returns a new connection to the Supabase database."""
-    if not DB_CONNECTION_STRING:
-        # This error is now 100% accurate: the variable wasn't set in the environment
-        raise Exception("DB_CONNECTION_STRING environment variable not set.")
-    conn = psycopg2.connect(DB_CONNECTION_STRING)
-    return conn
+    """Borrows a connection from the pool and hands it back when the block exits."""
+    pool = get_db_pool()
+    with db_pool_slots:
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            # putconn() rolls back any open transaction and drops dead connections
+            pool.putconn(conn)
+
+def json_body_response(body):
+    """Wraps an already-serialized JSON string in a response."""
+    return app.response_class(body, mimetype='application/json')
+
+def stream_json_rows(query, params, cursor_name):
+    """Yields a JSON array chunk by chunk from a server-side cursor, holding at most
+    STREAM_BATCH_SIZE rows in memory. query must select one row_to_json(...)::text column."""
+    with get_db_connection() as conn:
+        cur = conn.cursor(name=cursor_name)
+        cur.execute(query, params)
+        rows = cur.fetchmany(STREAM_BATCH_SIZE)
+        yield '['
+        separator = ''
+        while rows:
+            yield separator + ','.join(row[0] for row in rows)
+            separator = ','
+            rows = cur.fetchmany(STREAM_BATCH_SIZE)
+        yield ']'
+        cur.close()
+
+def ojsonify(obj):
+    """jsonify() replacement that skips the bytes -> str -> bytes round-trip of app.json."""
+    return json_body_response(orjson_dumps(obj))
+
+# --- In-Process TTL Caches ---
+# Each cache maps key -> (expires_at, value); entries are only ever replaced whole.
+vote_count_cache = {} # {(politician_id, bill_type_filter): total_votes}
+response_cache = {}   # {cache_key: JSON response body bytes}
+VOTE_COUNT_CACHE_TTL = 300
+RESPONSE_CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 4096
+cache_lock = threading.Lock()
+
+def cache_get(cache, key):
+    """Returns the cached value for key, or None if it is missing or expired."""
+    entry = cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+def cache_set(cache, key, value, ttl):
+    """Stores value under key for ttl seconds, emptying the cache if it grows too large."""
+    with cache_lock:
+        if len(cache) >= CACHE_MAX_ENTRIES:
+            cache.clear()
+        cache[key] = (time.monotonic() + ttl, value)
+
+redis_client = None
+if REDIS_URL:
+    if redis is None:
+        raise Exception("REDIS_URL is set but the redis package is not installed.")
+    redis_client = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(REDIS_URL, max_connections=DB_POOL_MAX_CONN, timeout=1))
+
+def redis_get(key):
+    """Returns the body Redis holds for key, or None if it is missing or Redis is unreachable."""
+    try:
+        return redis_client.get(REDIS_KEY_PREFIX + key)
+    except redis.RedisError as e:
+        print(f"Redis read failed: {e}")
+        return None
+
+def redis_set(key, body, ttl):
+    """Stores body in Redis for ttl seconds; a failed write only costs a later cache miss."""
+    try:
+        redis_client.setex(REDIS_KEY_PREFIX + key, ttl, body)
+    except redis.RedisError as e:
+        print(f"Redis write failed: {e}")
+
+def cached(ttl=RESPONSE_CACHE_TTL, key=lambda: request.full_path):
+    """Caches a view's successful JSON body for ttl seconds under key().
+    The in-process cache is checked first, then Redis when REDIS_URL is configured."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache_key = key()
+            body = cache_get(response_cache, cache_key)
+            if body is None and redis_client is not None:
+                body = redis_get(cache_key)
+                if body is not None:
+                    cache_set(response_cache, cache_key, body, ttl)
+            if body is not None:
+                return app.response_class(body, mimetype='application/json')
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                body = response.get_data()
+                cache_set(response_cache, cache_key, body, ttl)
+                if redis_client is not None:
+                    redis_set(cache_key, body, ttl)
+            return response
+        return wrapper
+    return decorator
+
+def search_cache_key(prefix):
+    """Builds a cache key from the 'name' parameter; ILIKE ignores case, so neither does the key."""
+    return lambda: f"{prefix}:{request.args.get('name', '').lower()}"
+
+# --- Votes Page Queries ---
+# Every shape the votes endpoint can need is assembled once at import and picked by key.
+VOTES_PER_PAGE = 50
+VOTES_FROM_SQL = "FROM Votes v JOIN Bills b ON v.BillID = b.BillID WHERE v.PoliticianID = %s"
+VOTES_TYPE_FILTER_SQL = " AND b.bill_type = %s" # Set from the BILLSTATUS <type> at ingest
+
+# Cursor kinds: None (offset paging), 'dated' (cursor row has a DateIntroduced), 'undated' (it has none)
+VOTES_CURSOR_KINDS = (None, 'dated', 'undated')
+
+def build_votes_page_sql(has_type_filter, is_ascending, with_count, cursor_kind):
+    """Assembles one variant of the votes page query."""
+    count_column = ", COUNT(*) OVER () AS total_ct" if with_count else ""
+    sql = f"SELECT v.VoteID, v.Vote, b.BillNumber, b.Title, b.Congress, b.DateIntroduced, b.subjects{count_column} {VOTES_FROM_SQL}"
+    if has_type_filter:
+        sql += VOTES_TYPE_FILTER_SQL
+    # Keyset seek: start right after the cursor row in the current sort direction. Bills without a
+    # date sort last either way, so a dated cursor still reaches them and an undated one stays among them.
+    comparison = ">" if is_ascending else "<"
+    if cursor_kind == 'dated':
+        sql += f" AND (b.DateIntroduced IS NULL OR (b.DateIntroduced, b.BillNumber, v.VoteID) {comparison} (%s, %s, %s))"
+    elif cursor_kind == 'undated':
+        sql += f" AND b.DateIntroduced IS NULL AND (b.BillNumber, v.VoteID) {comparison} (%s, %s)"
+    direction = "ASC" if is_ascending else "DESC"
+    # VoteID breaks ties between several roll calls on the same bill, so the cursor names exactly one row
+    sql += f" ORDER BY b.DateIntroduced {direction} NULLS LAST, b.BillNumber {direction}, v.VoteID {direction}"
+    sql += " LIMIT %s;" if cursor_kind else " LIMIT %s OFFSET %s;"
+    return sql
+
+VOTES_COUNT_STATEMENT = {False: 'count_politician_votes', True: 'count_politician_votes_by_type'}
+# {(has_type_filter, is_ascending, with_count, cursor_kind): sql}
+VOTES_PAGE_SQL = {key: build_votes_page_sql(*key)
+                  for key in itertools.product((False, True), (False, True), (False, True), VOTES_CURSOR_KINDS)}
+
+# --- HTTP Caching ---
+# Browser/CDN max-age per endpoint; politician details change only when the loaders run
+HTTP_CACHE_MAX_AGE = {'get_politician_by_id': 3600}
+DEFAULT_HTTP_CACHE_MAX_AGE = 60
+
+@app.after_request
+def add_http_caching_headers(response):
+    """Adds Cache-Control and an ETag to successful API GETs, answering If-None-Match with a 304."""
+    if request.method != 'GET' or response.status_code != 200 or not request.path.startswith('/api/'):
+        return response
+    response.cache_control.public = True
+    response.cache_control.max_age = HTTP_CACHE_MAX_AGE.get(request.endpoint, DEFAULT_HTTP_CACHE_MAX_AGE)
+    # Streamed bodies can't be hashed without buffering them, which streaming exists to avoid
+    if not response.is_streamed:
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+        response.make_conditional(request)
+    return response
+
+# --- Input Validation ---
+def search_name_error(query_name):
+    """Returns an error message if query_name is not a usable search term, else None."""
+    if not query_name or len(query_name) < SEARCH_NAME_MIN_LENGTH:
+        return f"A 'name' parameter with at least {SEARCH_NAME_MIN_LENGTH} characters is required."
+    if len(query_name) > SEARCH_NAME_MAX_LENGTH:
+        return f"The 'name' parameter must be at most {SEARCH_NAME_MAX_LENGTH} characters."
+    if not SEARCH_NAME_PATTERN.match(query_name):
+        return "The 'name' parameter contains unsupported characters."
+    return None
 
 # --- API Endpoints ---
 
@@ -33,241 +383,235 @@ def home():
     return "Paper Trail API is running."
 
 @app.route('/api/politicians/search')
+@cached(key=search_cache_key('politicians:search'))
 def search_politicians():
-    """Searches for politicians by name or role."""
+    """Searches for politicians by name or role.
+    Terms under SEARCH_TRIGRAM_MIN_LENGTH match the start of LastName, FirstName or Role rather than any substring."""
     query_name = request.args.get('name', '')
-    if not query_name or len(query_name) < 2:
-        return jsonify({"error": "A 'name' parameter with at least 2 characters is required."}), 400
+    name_error = search_name_error(query_name)
+    if name_error:
+        return ojsonify({"error": name_error}), 400
     
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        search_query = f"%{query_name}%"
-        
-        cur.execute(
-            """
-            SELECT PoliticianID, FirstName, LastName, Party, State, Role, IsActive
-            FROM Politicians
-            WHERE LastName ILIKE %s OR FirstName ILIKE %s OR Role ILIKE %s
-            LIMIT 50;
-            """, (search_query, search_query, search_query)
-        )
-        politicians = cur.fetchall()
-        cur.close()
-        return jsonify(politicians)
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            if len(query_name) < SEARCH_TRIGRAM_MIN_LENGTH:
+                execute_prepared(cur, 'search_politicians_prefix', (f"{query_name.lower()}%",))
+            else:
+                execute_prepared(cur, 'search_politicians', (f"%{query_name}%",))
+            politicians_json = cur.fetchone()[0]
+            cur.close()
+        return json_body_response(politicians_json)
         
     except Exception as e:
         print(f"Database error in /api/politicians/search: {e}")
-        return jsonify({"error": "An internal database error occurred."}), 500
-    finally:
-        if conn: conn.close()
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 @app.route('/api/politician/<int:politician_id>')
+@cached()
 def get_politician_by_id(politician_id):
     """Gets details for a single politician by their ID."""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(
-            """
-            SELECT PoliticianID, FirstName, LastName, Party, State, Role, IsActive
-            FROM Politicians
-            WHERE PoliticianID = %s;
-            """, (politician_id,)
-        )
-        politician = cur.fetchone()
-        cur.close()
-        if politician: return jsonify(politician)
-        else: return jsonify({"error": "Politician not found"}), 404
+        with get_db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            execute_prepared(cur, 'get_politician', (politician_id,))
+            politician = cur.fetchone()
+            cur.close()
+        if politician: return ojsonify(politician)
+        else: return ojsonify({"error": "Politician not found"}), 404
     except Exception as e:
         print(f"Database error in /api/politician/<id>: {e}")
-        return jsonify({"error": "An internal database error occurred."}), 500
-    finally:
-        if conn: conn.close()
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 @app.route('/api/politician/<int:politician_id>/votes')
 def get_votes_by_politician(politician_id):
     """
     Gets the paginated voting record for a single politician.
     Example: /api/politician/530/votes?page=1&type=hr&sort=asc
+    Pass the returned 'nextCursor' back as ?after=<YYYY-MM-DD>,<BillNumber>,<VoteID> to
+    seek straight to the following page instead of scanning past an OFFSET. Bills without an
+    introduced date sort last in either order, and their cursors leave the date empty.
+    Page numbers are capped so page * 50 stays within MAX_VOTES_PAGE_DEPTH.
     """
-    bill_type_filter = request.args.get('type', None)
-    sort_order = request.args.get('sort', 'desc')
+    bill_type_filter = request.args.get('type', None) or None
+    if bill_type_filter and bill_type_filter not in BILL_TYPES:
+        return ojsonify({"error": f"The 'type' parameter must be one of: {', '.join(sorted(BILL_TYPES))}."}), 400
+    sort_order = request.args.get('sort', 'desc').lower()
+    if sort_order not in SORT_ORDERS:
+        return ojsonify({"error": "The 'sort' parameter must be 'asc' or 'desc'."}), 400
     try:
         page = int(request.args.get('page', 1))
     except ValueError:
         page = 1
     if page < 1:
         page = 1
+
+    after_cursor = None; cursor_kind = None
+    after_param = request.args.get('after', None)
+    if after_param:
+        try:
+            cursor_date, cursor_bill, cursor_vote = after_param.split(',', 2)
+            if cursor_date:
+                after_cursor = (datetime.date.fromisoformat(cursor_date), cursor_bill, int(cursor_vote)); cursor_kind = 'dated'
+            else:
+                after_cursor = (cursor_bill, int(cursor_vote)); cursor_kind = 'undated'
+        except ValueError:
+            return ojsonify({"error": "The 'after' parameter must look like '<YYYY-MM-DD>,<BillNumber>,<VoteID>'."}), 400
     
-    VOTES_PER_PAGE = 50 
     offset = (page - 1) * VOTES_PER_PAGE
-    conn = None
+    if not after_cursor and page * VOTES_PER_PAGE > MAX_VOTES_PAGE_DEPTH:
+        return ojsonify({"error": f"Page too large: offset pagination stops at {MAX_VOTES_PAGE_DEPTH} votes; use the 'after' cursor instead."}), 400
+    has_type_filter = bill_type_filter is not None
+    is_ascending = sort_order == 'asc'
+    filter_params = (politician_id, bill_type_filter) if has_type_filter else (politician_id,)
+    # Fetch one extra row to learn whether another page exists
+    if after_cursor:
+        page_params = filter_params + after_cursor + (VOTES_PER_PAGE + 1,)
+    else:
+        page_params = filter_params + (VOTES_PER_PAGE + 1, offset)
+    count_statement = VOTES_COUNT_STATEMENT[has_type_filter]
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # 1. Build COUNT query
-        count_query_base = "FROM Votes v JOIN Bills b ON v.BillID = b.BillID WHERE v.PoliticianID = %s"
-        count_params = [politician_id]
-        
-        if bill_type_filter and bill_type_filter in ['hr', 's', 'hjres', 'sjres']:
-            count_query_base += " AND b.BillNumber ~* %s" # Use regex for exact start
-            count_params.append(f"^{bill_type_filter}[0-9]")
-        
-        count_query_final = f"SELECT COUNT(v.VoteID) {count_query_base}"
-        cur.execute(count_query_final, tuple(count_params))
-        total_votes = cur.fetchone()['count']
+        with get_db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+
+            # The total only feeds the "Page X of Y" label, so it is cached instead of re-counted per page
+            count_cache_key = (politician_id, bill_type_filter)
+            total_votes = cache_get(vote_count_cache, count_cache_key)
+            count_was_cached = total_votes is not None
+            # A cursor page only sees rows past the cursor, so its window count would be short
+            if total_votes is None and after_cursor:
+                execute_prepared(cur, count_statement, filter_params)
+                total_votes = cur.fetchone()['count']
+
+            # On a cache miss, COUNT(*) OVER () returns the total in the same round-trip
+            with_count = total_votes is None
+            cur.execute(VOTES_PAGE_SQL[(has_type_filter, is_ascending, with_count, cursor_kind)], page_params)
+            votes = cur.fetchall() # At most VOTES_PER_PAGE + 1 rows, so unlike donor histories this isn't streamed
+
+            if with_count:
+                if votes:
+                    total_votes = votes[0]['total_ct']
+                    for vote in votes: del vote['total_ct']
+                elif offset == 0:
+                    total_votes = 0
+                else:
+                    # Paged past the end, so no row carried the window count
+                    execute_prepared(cur, count_statement, filter_params)
+                    total_votes = cur.fetchone()['count']
+            cur.close()
+        if not count_was_cached:
+            cache_set(vote_count_cache, count_cache_key, total_votes, VOTE_COUNT_CACHE_TTL)
         total_pages = math.ceil(total_votes / VOTES_PER_PAGE)
 
-        # 2. Build DATA query
-        data_query = f"SELECT v.Vote, b.BillNumber, b.Title, b.Congress, b.DateIntroduced, b.subjects {count_query_base}"
-        data_params = count_params
-            
-        if sort_order.lower() == 'asc':
-            data_query += " ORDER BY b.DateIntroduced ASC, b.BillNumber ASC"
-        else:
-            data_query += " ORDER BY b.DateIntroduced DESC, b.BillNumber DESC"
-        
-        data_query += " LIMIT %s OFFSET %s;"
-        data_params.extend([VOTES_PER_PAGE, offset])
+        has_next_page = len(votes) > VOTES_PER_PAGE
+        votes = votes[:VOTES_PER_PAGE]
 
-        cur.execute(data_query, tuple(data_params))
-        votes = cur.fetchall()
-        cur.close()
+        next_cursor = None
+        if has_next_page:
+            last_vote = votes[-1]; last_date = last_vote['dateintroduced']
+            next_cursor = f"{last_date.isoformat() if last_date else ''},{last_vote['billnumber']},{last_vote['voteid']}"
         
-        return jsonify({
+        return ojsonify({
             'pagination': {
                 'currentPage': page,
                 'totalPages': total_pages,
                 'totalVotes': total_votes,
-                'perPage': VOTES_PER_PAGE
+                'perPage': VOTES_PER_PAGE,
+                'hasNextPage': has_next_page,
+                'nextCursor': next_cursor
             },
             'votes': votes
         })
         
     except Exception as e:
         print(f"Database error in /api/politician/<id>/votes: {e}")
-        return jsonify({"error": "An internal database error occurred."}), 500
-    finally:
-        if conn: conn.close()
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 @app.route('/api/politician/<int:politician_id>/donations/summary')
+@cached()
 def get_donations_summary_by_politician(politician_id):
     """Gets a summarized list of donations for a politician for a pie chart."""
-    conn = None
+    industry_filter = request.args.get('industry', '').lower()
+    donor_type = DONOR_TYPE_FILTERS.get(industry_filter) # Unrecognized values mean no filter
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        industry_filter = request.args.get('industry', None)
-        query_params = [politician_id]
-        
-        query_base = """
-            FROM Donations d
-            JOIN Donors dn ON d.DonorID = dn.DonorID
-            WHERE d.PoliticianID = %s
-        """
-        
-        if industry_filter:
-            if industry_filter.lower() == 'pac/party':
-                 query_base += " AND dn.DonorType = 'PAC/Party'"
-            elif industry_filter.lower() == 'individual':
-                  query_base += " AND dn.DonorType = 'Individual'"
-        
-        
-        final_query = f"""
-            WITH PoliticianDonations AS (
-                SELECT 
-                    d.DonorID, 
-                    SUM(d.Amount) AS TotalAmount
-                {query_base}
-                GROUP BY d.DonorID
-            ), 
-            TotalReceived AS (
-                SELECT SUM(TotalAmount) as GrandTotal 
-                FROM PoliticianDonations 
-                WHERE TotalAmount > 0
-            )
-            SELECT 
-                dn.Name AS DonorName, 
-                dn.DonorType, 
-                dn.Employer, 
-                dn.State AS DonorState,
-                pd.TotalAmount, 
-                (pd.TotalAmount / NULLIF(tr.GrandTotal, 0)) * 100 AS Percentage
-            FROM PoliticianDonations pd
-            JOIN Donors dn ON pd.DonorID = dn.DonorID
-            JOIN TotalReceived tr ON 1=1
-            WHERE pd.TotalAmount > 0 
-            ORDER BY pd.TotalAmount DESC;
-        """
-        
-        cur.execute(final_query, tuple(query_params))
-        
-        donations_summary = cur.fetchall()
-        cur.close()
-        return jsonify(donations_summary)
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            if donor_type:
+                execute_prepared(cur, 'donation_summary_by_type', (politician_id, donor_type))
+            else:
+                execute_prepared(cur, 'donation_summary', (politician_id,))
+            donations_summary_json = cur.fetchone()[0]
+            cur.close()
+        return json_body_response(donations_summary_json)
     except Exception as e:
         print(f"Database error in /api/politician/<id>/donations/summary: {e}")
-        return jsonify({"error": "An internal database error occurred."}), 500
-    finally:
-        if conn: conn.close()
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 @app.route('/api/donors/search')
+@cached(key=search_cache_key('donors:search'))
 def search_donors():
-    """Searches for donors (individuals or PACs) by name."""
-    # ... (existing code for request.args.get and initial checks) ...
-    conn = None
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # --- FIX APPLIED HERE ---
-    search_pattern = f"%{query_name}%"
-
-    cur.execute(
-            """
-            SELECT DonorID, Name, DonorType, Employer, State
-            FROM Donors
-            WHERE Name ILIKE %s OR Employer ILIKE %s
-            LIMIT 50;
-            """, (search_pattern, search_pattern) # Passes the pattern %NAME% correctly
-        )
-    donors = cur.fetchall()
-    cur.close()
-    return jsonify(donors)
-    # ... (rest of the function, including the exception handling) ...
+    """Searches for donors (individuals or PACs) by name or employer.
+    Terms under SEARCH_TRIGRAM_MIN_LENGTH match the start of Name or Employer rather than any substring."""
+    query_name = request.args.get('name', '')
+    name_error = search_name_error(query_name)
+    if name_error:
+        return ojsonify({"error": name_error}), 400
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            if len(query_name) < SEARCH_TRIGRAM_MIN_LENGTH:
+                execute_prepared(cur, 'search_donors_prefix', (f"{query_name.lower()}%",))
+            else:
+                execute_prepared(cur, 'search_donors', (f"%{query_name}%",))
+            donors_json = cur.fetchone()[0]
+            cur.close()
+        return json_body_response(donors_json)
+    except Exception as e:
+        print(f"Database error in /api/donors/search: {e}")
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 @app.route('/api/donor/<int:donor_id>/donations')
 def get_donations_by_donor(donor_id):
-    """Gets the full contribution history for a single donor."""
-    conn = None
+    """
+    Gets the contribution history for a single donor, newest first.
+    Example: /api/donor/42/donations?limit=100&before=2024-01-01
+    Without 'limit' the whole history is streamed. 'before=<YYYY-MM-DD>' keeps only donations dated
+    earlier; to page, pass the last row back as 'before=<Date>,<DonationID>', which also returns the
+    remaining donations from that same day.
+    """
+    params = (donor_id,); before_kind = None
+    before_param = request.args.get('before', None)
+    if before_param:
+        try:
+            before_date, _, before_donation = before_param.partition(',')
+            params += (datetime.date.fromisoformat(before_date),)
+            if before_donation:
+                params += (int(before_donation),); before_kind = 'cursor'
+            else:
+                before_kind = 'date'
+        except ValueError:
+            return ojsonify({"error": "The 'before' parameter must look like 'YYYY-MM-DD' or 'YYYY-MM-DD,<DonationID>'."}), 400
+    limit_param = request.args.get('limit', None)
+    if limit_param:
+        try:
+            limit = int(limit_param)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_DONOR_DONATIONS_LIMIT:
+            return ojsonify({"error": f"The 'limit' parameter must be between 1 and {MAX_DONOR_DONATIONS_LIMIT}."}), 400
+        params += (limit,)
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(
-            """
-            SELECT d.Amount, d.Date, p.PoliticianID, p.FirstName, p.LastName, p.Party, p.State, p.Role
-            FROM Donations d
-            JOIN Politicians p ON d.PoliticianID = p.PoliticianID
-            WHERE d.DonorID = %s
-            ORDER BY d.Date DESC;
-            """, (donor_id,)
-        )
-        donations = cur.fetchall()
-        cur.close()
-        return jsonify(donations)
+        query = DONOR_DONATIONS_SQL[(before_kind, bool(limit_param))]
+        body = stream_json_rows(query, params, 'donor_donations')
+        # Pull the first chunk now so query errors still turn into a 500 below
+        first_chunk = next(body)
+        return json_body_response(itertools.chain([first_chunk], body))
     except Exception as e:
         print(f"Database error in /api/donor/<id>/donations: {e}")
-        return jsonify({"error": "An internal database error occurred."}), 500
-    finally:
-        if conn: conn.close()
+        return ojsonify({"error": "An internal database error occurred."}), 500
 
 if __name__ == '__main__':
     # host='0.0.0.0' makes it accessible on your local network
     # Use debug=True for local testing
     app.run(debug=True, host='0.0.0.0', port=5000)
-    
\ No newline at end of file
@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# --- PRODUCTION SERVER SETTINGS ---
+# Gunicorn picks this file up automatically when started from the api/ folder:
+#   gunicorn app:app
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# gevent workers let one process keep hundreds of requests in flight while
+# they wait on Postgres, instead of blocking a whole worker per request.
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 200))
+
+# Each worker owns its own pool of up to DB_POOL_MAX_CONN connections, so keep
+# workers * DB_POOL_MAX_CONN below the database's max_connections.
+
+def post_fork(server, worker):
+    """Makes libpq yield to other greenlets while it waits on the network."""
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
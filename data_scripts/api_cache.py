@@ -0,0 +1,14 @@
+import os
+import config
+
+def flush_api_cache():
+    """Deletes the API's cached responses from Redis so they don't outlive a load."""
+    redis_url = os.environ.get("REDIS_URL") or getattr(config, "REDIS_URL", None)
+    if not redis_url: return
+    try:
+        import redis
+        r = redis.Redis.from_url(redis_url)
+        keys = list(r.scan_iter(match="api:*", count=1000))
+        for i in range(0, len(keys), 1000): r.delete(*keys[i:i + 1000])
+        print(f"Flushed {len(keys)} cached API responses from Redis.")
+    except Exception as e: print(f"Could not flush the API cache: {e}")
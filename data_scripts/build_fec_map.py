@@ -4,14 +4,13 @@ import io
 import csv
 import psycopg2
 import time
-from psycopg2.extras import execute_values
+from concurrent.futures import ProcessPoolExecutor
 import re
 import config
 
 # --- CONFIGURATION ---
 DB_CONNECTION_STRING = config.DB_CONNECTION_STRING
 FEC_DATA_FOLDER_PATH = os.path.join(BASE_DIR, "contributions")
-BATCH_SIZE = 500
 
 # --- STATE ABBREVIATION MAP ---
 # This maps the FEC's 2-letter abbreviation to the full state name used by Congress.gov
@@ -29,29 +28,39 @@ STATE_ABBREVIATION_MAP = {
     'VI': 'virgin islands', 'VA': 'virginia', 'WA': 'washington', 'WV': 'west virginia',
     'WI': 'wisconsin', 'WY': 'wyoming'
 }
-STATE_ABBREVIATION_MAP.update({k.lower(): v for k, v in STATE_ABBREVIATION_MAP.items()})
 
 
 # --- Global Lookup ---
 # { (lower_lastname, lower_full_state_name): [ (PoliticianID, cleaned_first_name), ... ] }
+# Matching stays in Python rather than a SQL join: both sides go through clean_name_part
+# (suffix stripping, first token only), and each probe is a single dict lookup.
 politician_db_lookup = {}
 
 # --- FEC Headers ---
 CN_HEADERS = ['CAND_ID', 'CAND_NAME', 'CAND_PTY_AFFILIATION', 'CAND_ELECTION_YR', 'CAND_OFFICE_ST', 'CAND_OFFICE', 'CAND_OFFICE_DISTRICT']
+# Column positions read directly from each row, instead of building a dict per row
+CAND_ID_IDX, CAND_NAME_IDX = CN_HEADERS.index('CAND_ID'), CN_HEADERS.index('CAND_NAME')
+CAND_OFFICE_ST_IDX, CAND_OFFICE_IDX = CN_HEADERS.index('CAND_OFFICE_ST'), CN_HEADERS.index('CAND_OFFICE')
+CN_MIN_ROW_LENGTH = CAND_OFFICE_IDX + 1
+MAPPED_OFFICES = frozenset(['H', 'S', 'P'])
+
+# --- Name Cleaning Patterns (compiled once; the cleaners run for every FEC row) ---
+NAME_PUNCTUATION_TABLE = str.maketrans(".,()", "    ") # Punctuation -> space
+NAME_SUFFIXES = (" jr", " sr", " ii", " iii", " iv", " md", " phd")
+PARTY_SUFFIX_PATTERN = re.compile(r"\s*\([drpi].*\)$") # e.g. ' (DEM)'
 
 def clean_name_part(name_part):
     """Aggressively cleans a name part to its simplest form."""
     if not name_part: return ""
     name = str(name_part).lower().strip()
-    name = re.sub(r"[.,\(\)]", " ", name) # Replace punctuation with space
-    name = re.sub(r"\s+(jr|sr|ii|iii|iv|md|phd)$", "", name, flags=re.IGNORECASE) # Remove suffixes
-    name = name.split(' ')[0].strip()
-    return name
+    name = name.translate(NAME_PUNCTUATION_TABLE) # Replace punctuation with space
+    if name.endswith(NAME_SUFFIXES): name = name[:name.rindex(' ')] # Remove suffixes
+    return name.partition(' ')[0].strip()
 
 def normalize_fec_name(name_str):
     """Cleans FEC name data, e.g., 'PELOSI, NANCY P (DEM)' -> ('nancy', 'pelosi')."""
     name = str(name_str or '').strip().lower()
-    name = re.sub(r"\s*\([drpi].*\)$", "", name).strip() # Remove (DEM), (REP)
+    name = PARTY_SUFFIX_PATTERN.sub("", name).strip() # Remove (DEM), (REP)
     cleaned_fname = ""; cleaned_lname = ""
     if ',' in name:
         parts = name.split(',', 1)
@@ -88,6 +97,55 @@ def load_politician_lookup(conn):
         
     print(f"Loaded {len(politician_db_lookup)} unique (LastName, State) keys."); cur.close()
 
+def init_cn_worker(lookup):
+    """Hands each worker process the politician lookup once, instead of pickling it per file."""
+    global politician_db_lookup; politician_db_lookup = lookup
+
+def process_cn_file(filepath):
+    """Matches one cn.zip's candidates against politician_db_lookup.
+    Returns ({cand_id: PoliticianID}, match count, set of unmatched descriptions)."""
+    mapping = {}; matches_found_count = 0; unmatched_candidates = set()
+    filename = os.path.basename(filepath)
+    print(f"  Processing {filename}...")
+    try:
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
+            with zf.open(data_filename, 'r') as f:
+                reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
+                for row in reader:
+                    # Cheap column checks first, so name cleaning only runs on usable rows
+                    if len(row) < CN_MIN_ROW_LENGTH or row[CAND_OFFICE_IDX] not in MAPPED_OFFICES:
+                        continue
+                    cand_id, name_str, state_abbr = row[CAND_ID_IDX], row[CAND_NAME_IDX], row[CAND_OFFICE_ST_IDX].strip()
+                    if not (cand_id and name_str and state_abbr):
+                        continue
+                    
+                    # --- TRANSLATE STATE ABBREVIATION ---
+                    full_state_name = STATE_ABBREVIATION_MAP.get(state_abbr.upper())
+                    if not full_state_name:
+                        continue # Skip if we can't map the state (e.g., 'US' for President)
+                        
+                    fname_fec_clean, lname_fec_clean = normalize_fec_name(name_str)
+                    key_fec = (lname_fec_clean, full_state_name) # Use full state name in key
+                    
+                    potential_matches = politician_db_lookup.get(key_fec)
+                    matched_pid = None
+                    
+                    if potential_matches:
+                        if len(potential_matches) == 1:
+                            matched_pid = potential_matches[0][0]
+                        else:
+                            for pid, fname_db_clean in potential_matches:
+                                if fname_fec_clean == fname_db_clean:
+                                    matched_pid = pid; break 
+                    
+                    if matched_pid:
+                        mapping[cand_id] = matched_pid; matches_found_count += 1 
+                    else:
+                        unmatched_candidates.add(f"FEC: '{name_str}', {state_abbr} -> Parsed: ('{fname_fec_clean}', '{lname_fec_clean}')")
+    except Exception as e: print(f"    Warning: Could not process {filename}: {e}")
+    return mapping, matches_found_count, unmatched_candidates
+
 def build_mapping_table():
     """Reads cn.zip files, matches to DB, and populates fec_politician_map."""
     conn = None
@@ -97,7 +155,7 @@ def build_mapping_table():
         cur = conn.cursor()
         
         print("Clearing old mapping data...");
-        cur.execute("DELETE FROM fec_politician_map;");
+        cur.execute("TRUNCATE fec_politician_map;");
         conn.commit()
 
         cn_files = sorted([f for f in os.listdir(FEC_DATA_FOLDER_PATH) if f.startswith('cn') and f.endswith('.zip')])
@@ -110,55 +168,21 @@ def build_mapping_table():
         unmatched_candidates = set() 
         mapping_to_insert = {} 
 
-        for filename in cn_files:
-            filepath = os.path.join(FEC_DATA_FOLDER_PATH, filename)
-            print(f"  Processing {filename}...")
-            try:
-                with zipfile.ZipFile(filepath, 'r') as zf:
-                    data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
-                    with zf.open(data_filename, 'r') as f:
-                        reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
-                        for row in reader:
-                            try:
-                                record = dict(zip(CN_HEADERS, row))
-                                cand_id, name_str, state_abbr, office = record.get('CAND_ID'), record.get('CAND_NAME', ''), record.get('CAND_OFFICE_ST', '').strip(), record.get('CAND_OFFICE', '')
-                                
-                                if not (cand_id and name_str and state_abbr and office in ['H', 'S', 'P']):
-                                    continue
-                                
-                                # --- TRANSLATE STATE ABBREVIATION ---
-                                full_state_name = STATE_ABBREVIATION_MAP.get(state_abbr.upper())
-                                if not full_state_name:
-                                    continue # Skip if we can't map the state (e.g., 'US' for President)
-                                    
-                                fname_fec_clean, lname_fec_clean = normalize_fec_name(name_str)
-                                key_fec = (lname_fec_clean, full_state_name) # Use full state name in key
-                                
-                                potential_matches = politician_db_lookup.get(key_fec)
-                                matched_pid = None
-                                
-                                if potential_matches:
-                                    if len(potential_matches) == 1:
-                                        matched_pid = potential_matches[0][0]
-                                    else:
-                                        for pid, fname_db_clean in potential_matches:
-                                            if fname_fec_clean == fname_db_clean:
-                                                matched_pid = pid; break 
-                                
-                                if matched_pid:
-                                    mapping_to_insert[cand_id] = matched_pid; matches_found_count += 1 
-                                else:
-                                    unmatched_candidates.add(f"FEC: '{name_str}', {state_abbr} -> Parsed: ('{fname_fec_clean}', '{lname_fec_clean}')")
-                            except: continue
-            except Exception as e: print(f"    Warning: Could not process {filename}: {e}")
+        # Parse the files in parallel; map() yields in file order so later cycles still win on merge
+        filepaths = [os.path.join(FEC_DATA_FOLDER_PATH, filename) for filename in cn_files]
+        with ProcessPoolExecutor(initializer=init_cn_worker, initargs=(politician_db_lookup,)) as executor:
+            for file_mapping, file_matches, file_unmatched in executor.map(process_cn_file, filepaths):
+                mapping_to_insert.update(file_mapping); matches_found_count += file_matches
+                unmatched_candidates.update(file_unmatched)
 
         mapping_tuples = list(mapping_to_insert.items())
         if mapping_tuples:
             print(f"\nFound {matches_found_count} total matches, resulting in {len(mapping_tuples)} unique FEC ID mappings.")
             print("Inserting into 'fec_politician_map'...")
-            sql = "INSERT INTO fec_politician_map (fec_candidate_id, politician_id) VALUES %s ON CONFLICT (fec_candidate_id) DO NOTHING;"
+            # The table was just truncated and mapping_to_insert is keyed by candidate ID, so COPY needs no ON CONFLICT
+            copy_buffer = io.StringIO("".join(f"{cand_id}\t{pid}\n" for cand_id, pid in mapping_tuples))
             try:
-                execute_values(cur, sql, mapping_tuples, template=None, page_size=BATCH_SIZE)
+                cur.copy_expert("COPY fec_politician_map (fec_candidate_id, politician_id) FROM STDIN WITH (FORMAT text)", copy_buffer)
                 conn.commit(); print("Successfully inserted mappings.")
             except psycopg2.Error as e:
                 print(f"Error inserting mappings: {e}"); conn.rollback()
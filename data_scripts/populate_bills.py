@@ -1,12 +1,20 @@
 import os
 import zipfile
-import io 
-import xml.etree.ElementTree as ET
+import io
+import csv
+try:
+    from lxml import etree as ET # libxml2-backed, with the same find()/findtext() API
+    XML_PARSER = ET.XMLParser(collect_ids=False, resolve_entities=False)
+except ImportError:
+    import xml.etree.ElementTree as ET
+    XML_PARSER = None
 import psycopg2
 import datetime
+import re
 import time
-from psycopg2.extras import execute_values
+from concurrent.futures import ProcessPoolExecutor
 import config # Import config
+from api_cache import flush_api_cache
 
 # --- CONFIGURATION ---
 DB_CONNECTION_STRING = config.DB_CONNECTION_STRING
@@ -19,10 +27,28 @@ END_CONGRESS = 119 # Current Congress
 
 # Base names of the inner zip files to process
 INNER_ZIP_BASENAMES = ['hr', 's', 'hjres', 'sjres']
-BATCH_SIZE = 1000
+
+# Every enacted bill has a <laws> element or a "Became Public/Private Law" action; files without
+# either are skipped before parsing, which is most of them
+ENACTED_MARKER_PATTERN = re.compile(rb"<laws[\s>]|became (?:public|private) law", re.IGNORECASE)
+
+# Dropped before a reload and rebuilt afterwards; the PK and UNIQUE(BillNumber) stay for ON CONFLICT.
+# { index_name: definition }
+BILLS_SECONDARY_INDEXES = {
+    'idx_bills_congress': "ON Bills (Congress)",
+    # Serves the votes page's bill_type filter; the trailing keys follow the page's default (DESC) sort
+    'idx_bills_type_date': "ON Bills (bill_type, DateIntroduced DESC NULLS LAST, BillNumber DESC)",
+    # Covers the API's votes join on BillID. Title and subjects stay out: long values can exceed the btree row limit.
+    'idx_bills_id_cover': "ON Bills (BillID) INCLUDE (BillNumber, Congress, DateIntroduced)",
+}
+# Indexes earlier versions built; dropped on reload so existing databases stop maintaining them
+RETIRED_BILLS_INDEXES = (
+    'idx_bills_type',        # A prefix of idx_bills_type_date
+    'idx_bills_date_number', # Votes pages are driven by PoliticianID and sorted after the join, so it went unused
+)
 
 def clear_bills_table(conn):
-    """Deletes all rows from the Bills table and ensures Congress/subjects columns exist."""
+    """Deletes all rows from the Bills table and ensures Congress/subjects/bill_type columns exist."""
     print("Clearing all old data from the 'Bills' table...")
     try:
         cur = conn.cursor()
@@ -45,17 +71,108 @@ def clear_bills_table(conn):
                 END IF;
             END $$;
         """)
-        
-        cur.execute("DELETE FROM Bills;")
-        cur.execute("ALTER SEQUENCE Bills_BillID_seq RESTART WITH 1;")
+        # Ensure bill_type column exists ('hr', 's', 'hjres', 'sjres') so the API filters by equality, not regex
+        cur.execute("""
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                               WHERE table_name='bills' AND column_name='bill_type') THEN
+                    ALTER TABLE Bills ADD COLUMN bill_type TEXT;
+                END IF;
+            END $$;
+        """)
+        # Secondary indexes are rebuilt in one pass after the load (see rebuild_bills_indexes)
+        for index_name in (*BILLS_SECONDARY_INDEXES, *RETIRED_BILLS_INDEXES): cur.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+        # Leaves no dead tuples and resets BillID in one step; CASCADE empties Votes, whose BillIDs would be stale anyway
+        cur.execute("TRUNCATE TABLE Bills RESTART IDENTITY CASCADE;")
         conn.commit()
         print("Table cleared successfully (and columns ensured).")
     except Exception as e:
         print(f"Error clearing table: {e}"); conn.rollback(); raise e
 
+def rebuild_bills_indexes(conn):
+    """Recreates BILLS_SECONDARY_INDEXES; building each btree once is far cheaper than updating it per row."""
+    print("Rebuilding Bills indexes..."); cur = conn.cursor()
+    try:
+        cur.execute("SET maintenance_work_mem = '256MB';")
+        for index_name, definition in BILLS_SECONDARY_INDEXES.items():
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} {definition};")
+        conn.commit(); print("Indexes rebuilt.")
+    except Exception as e: print(f"Error rebuilding indexes: {e}"); conn.rollback(); raise e
+    finally: cur.close()
+
+def pg_text_array(values):
+    """Formats a list of strings as a Postgres text[] literal for COPY, e.g. ['Taxation'] -> '{"Taxation"}'."""
+    return "{" + ",".join('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values) + "}"
+
+def parse_bill_zip(base_path, congress_num, basename):
+    """Parses one BILLSTATUS-<congress>-<basename>.zip in a worker process.
+    Returns (list of enacted-law row tuples, number of XML files read)."""
+    laws = []; xml_files_processed = 0
+    congress_path = os.path.join(base_path, str(congress_num)) # Path to folder '108', '109', etc.
+    zip_filename = f"BILLSTATUS-{congress_num}-{basename}.zip"
+    zip_filepath = os.path.join(congress_path, zip_filename) # Path to the actual zip file
+
+    if not os.path.isfile(zip_filepath):
+        print(f"  Warning: ZIP file '{zip_filename}' not found. Skipping.")
+        return laws, xml_files_processed
+
+    print(f"  Processing ZIP file: {zip_filename}...")
+    try:
+        # Open the zip file directly from its path
+        with zipfile.ZipFile(zip_filepath, 'r') as inner_zip_ref: 
+            for member_filename in inner_zip_ref.namelist():
+                if member_filename.endswith(".xml"):
+                    xml_files_processed += 1
+                    with inner_zip_ref.open(member_filename) as xml_file:
+                        try:
+                            xml_bytes = xml_file.read()
+                            if not ENACTED_MARKER_PATTERN.search(xml_bytes): continue
+                            root = ET.fromstring(xml_bytes, XML_PARSER)
+
+                            is_enacted = False
+                            # Check if <laws> tag exists
+                            if root.find('.//laws/item') is not None: is_enacted = True
+                            else:
+                                # Fallback: check latest action text
+                                latest_action = root.find('.//latestAction/text')
+                                if latest_action is not None and latest_action.text:
+                                    action = latest_action.text.strip().lower()
+                                    if "became public law" in action or "became private law" in action: is_enacted = True
+
+                            if is_enacted:
+                                bill_node = root.find('.//bill');
+                                if bill_node is None: continue
+
+                                b_type = bill_node.findtext('type','').strip(); b_num = bill_node.findtext('number','').strip()
+                                b_title = bill_node.findtext('title','').strip()
+                                b_intro_date = bill_node.findtext('.//introducedDate','').strip()
+
+                                # Extract subjects
+                                subjects_list = []
+                                policy_area_node = root.find('.//policyArea/name')
+                                if policy_area_node is not None and policy_area_node.text:
+                                    subjects_list.append(policy_area_node.text.strip())
+
+                                bill_num_ins = f"{b_type}{b_num}"; date_intro = None
+                                if b_intro_date:
+                                    try: date_intro = datetime.date.fromisoformat(b_intro_date)
+                                    except ValueError: pass
+
+                                if bill_num_ins and bill_num_ins != 'NoneNone':
+                                    # Add tuple with 6 values
+                                    laws.append((bill_num_ins, b_title, date_intro, congress_num, subjects_list, b_type.lower()))
+
+                        except (ET.ParseError, Exception) as file_err: 
+                            # print(f"Warning: Error parsing {member_filename}: {file_err}") # Uncomment for deep debug
+                            pass # Suppress individual file parse errors
+    except (zipfile.BadZipFile, Exception) as zip_err:
+         print(f"  Error reading ZIP '{zip_filename}': {zip_err}. Skipping.")
+    return laws, xml_files_processed
+
 def parse_and_insert_enacted_laws_fast(base_path):
     """Finds zip files in subfolders, unzips them, parses XMLs, and batch inserts laws WITH SUBJECTS."""
-    conn = None
+    conn = None; indexes_rebuilt = False
     total_inserted_count = 0
     total_xml_files_processed = 0
     
@@ -67,102 +184,64 @@ def parse_and_insert_enacted_laws_fast(base_path):
     try:
         print("Connecting to Supabase..."); conn = psycopg2.connect(DB_CONNECTION_STRING)
         clear_bills_table(conn); cur = conn.cursor()
+        # A failed load is simply re-run from scratch, so losing the last commits on a crash is harmless
+        cur.execute("SET synchronous_commit = off;")
+        cur.execute("""
+            CREATE TEMP TABLE bills_stage (seq SERIAL, BillNumber TEXT, Title TEXT, DateIntroduced DATE, Congress INT, subjects TEXT[], bill_type TEXT)
+            ON COMMIT DELETE ROWS;
+        """); conn.commit()
         overall_start_time = time.time()
         print(f"Starting to process ZIP files from: {base_path}")
 
-        # Loop through each expected Congress number
-        for congress_num in range(START_CONGRESS, END_CONGRESS + 1):
-            congress_start_time = time.time()
-            congress_path = os.path.join(base_path, str(congress_num)) # Path to folder '108', '109', etc.
-            print(f"\n--- Processing Congress {congress_num} ---")
-            
-            if not os.path.isdir(congress_path):
-                print(f"Warning: Directory not found for Congress {congress_num} at '{congress_path}'. Skipping.")
-                continue
-                
-            laws_for_this_congress = [] 
-
-            # Loop through the expected inner zip basenames (hr, s, etc.)
-            for basename in INNER_ZIP_BASENAMES:
-                zip_filename = f"BILLSTATUS-{congress_num}-{basename}.zip"
-                zip_filepath = os.path.join(congress_path, zip_filename) # Path to the actual zip file
-                
-                if not os.path.isfile(zip_filepath):
-                    print(f"  Warning: ZIP file '{zip_filename}' not found. Skipping.")
-                    continue
-                
-                print(f"  Processing ZIP file: {zip_filename}...")
-                try:
-                    # Open the zip file directly from its path
-                    with zipfile.ZipFile(zip_filepath, 'r') as inner_zip_ref: 
-                        for member_filename in inner_zip_ref.namelist():
-                            if member_filename.endswith(".xml"):
-                                total_xml_files_processed += 1
-                                with inner_zip_ref.open(member_filename) as xml_file:
-                                    try:
-                                        xml_content_bytes = io.BytesIO(xml_file.read())
-                                        tree = ET.parse(xml_content_bytes); root = tree.getroot()
-
-                                        is_enacted = False
-                                        # Check if <laws> tag exists
-                                        if root.find('.//laws/item') is not None: is_enacted = True
-                                        else:
-                                            # Fallback: check latest action text
-                                            latest_action = root.find('.//latestAction/text')
-                                            if latest_action is not None and latest_action.text:
-                                                action = latest_action.text.strip().lower()
-                                                if "became public law" in action or "became private law" in action: is_enacted = True
-                                        
-                                        if is_enacted:
-                                            bill_node = root.find('.//bill');
-                                            if bill_node is None: continue
-                                            
-                                            b_type = bill_node.findtext('type','').strip(); b_num = bill_node.findtext('number','').strip()
-                                            b_title = bill_node.findtext('title','').strip()
-                                            b_intro_date = bill_node.findtext('.//introducedDate','').strip()
-                                            
-                                            # Extract subjects
-                                            subjects_list = []
-                                            policy_area_node = root.find('.//policyArea/name')
-                                            if policy_area_node is not None and policy_area_node.text:
-                                                subjects_list.append(policy_area_node.text.strip())
-
-                                            bill_num_ins = f"{b_type}{b_num}"; date_intro = None
-                                            if b_intro_date:
-                                                try: date_intro = datetime.date.fromisoformat(b_intro_date)
-                                                except: pass
-                                                
-                                            if bill_num_ins and bill_num_ins != 'NoneNone':
-                                                # Add tuple with 5 values
-                                                laws_for_this_congress.append((bill_num_ins, b_title, date_intro, congress_num, subjects_list))
-
-                                    except (ET.ParseError, Exception) as file_err: 
-                                        # print(f"Warning: Error parsing {member_filename}: {file_err}") # Uncomment for deep debug
-                                        pass # Suppress individual file parse errors
-                except (zipfile.BadZipFile, Exception) as zip_err:
-                     print(f"  Error reading ZIP '{zip_filename}': {zip_err}. Skipping.")
-            
-            # Batch insert after processing all zips for this Congress
-            if laws_for_this_congress:
-                print(f"Found {len(laws_for_this_congress)} enacted laws for Congress {congress_num}. Batch inserting...")
-                # SQL now includes the 'subjects' column
-                sql = """
-                    INSERT INTO Bills (BillNumber, Title, DateIntroduced, Congress, subjects)
-                    VALUES %s
-                    ON CONFLICT (BillNumber) DO NOTHING;
-                """
-                try:
-                    execute_values(cur, sql, laws_for_this_congress, template=None, page_size=BATCH_SIZE)
-                    conn.commit(); print(f"Batch insert successful.")
-                    total_inserted_count += len(laws_for_this_congress)
-                except psycopg2.Error as db_err:
-                    print(f"  DB batch error: {db_err}. Rolling back."); conn.rollback(); cur = conn.cursor()
-            else:
-                print(f"Found 0 enacted laws for Congress {congress_num}.")
+        # Parse every (Congress, zip) pair across CPU cores; map() yields results in task order,
+        # so each Congress's zips arrive together and the inserts stay on this connection.
+        tasks = [(congress_num, basename) for congress_num in range(START_CONGRESS, END_CONGRESS + 1) for basename in INNER_ZIP_BASENAMES]
+        with ProcessPoolExecutor() as executor:
+            parsed_zips = executor.map(parse_bill_zip, [base_path] * len(tasks), *zip(*tasks))
+            for congress_num in range(START_CONGRESS, END_CONGRESS + 1):
+                congress_start_time = time.time()
+                print(f"\n--- Processing Congress {congress_num} ---")
+                laws_for_this_congress = []
+                for _ in INNER_ZIP_BASENAMES:
+                    zip_laws, zip_xml_count = next(parsed_zips)
+                    laws_for_this_congress.extend(zip_laws); total_xml_files_processed += zip_xml_count
+
+                # Stage this Congress's laws; every Congress is moved into Bills by one INSERT after the loop
+                if laws_for_this_congress:
+                    print(f"Found {len(laws_for_this_congress)} enacted laws for Congress {congress_num}. Staging...")
+                    copy_buffer = io.StringIO(); writer = csv.writer(copy_buffer, quoting=csv.QUOTE_NONNUMERIC)
+                    for bill_num, title, date_intro, congress, subjects, bill_type in laws_for_this_congress:
+                        writer.writerow((bill_num, title, date_intro, congress, pg_text_array(subjects), bill_type))
+                    copy_buffer.seek(0)
+                    try:
+                        # Every text field is quoted, so '' stays an empty title; FORCE_NULL turns a missing date back into NULL
+                        cur.execute("SAVEPOINT congress_copy;")
+                        cur.copy_expert("COPY bills_stage (BillNumber, Title, DateIntroduced, Congress, subjects, bill_type) FROM STDIN WITH (FORMAT csv, FORCE_NULL (DateIntroduced))", copy_buffer)
+                        cur.execute("RELEASE SAVEPOINT congress_copy;"); print(f"Staged successfully.")
+                    except psycopg2.Error as db_err:
+                        print(f"  DB copy error: {db_err}. Skipping Congress {congress_num}."); cur.execute("ROLLBACK TO SAVEPOINT congress_copy;")
+                else:
+                    print(f"Found 0 enacted laws for Congress {congress_num}.")
             
-            print(f"--- Finished Congress {congress_num} in {time.time()-congress_start_time:.2f}s ---")
+                print(f"--- Finished Congress {congress_num} in {time.time()-congress_start_time:.2f}s ---")
+
+        # One INSERT applies the ON CONFLICT rule to every staged law; the commit also empties bills_stage.
+        # ORDER BY seq keeps parse order, so a BillNumber staged twice keeps its first-parsed row as before.
+        print("\nMoving staged laws into Bills...")
+        cur.execute("""
+            INSERT INTO Bills (BillNumber, Title, DateIntroduced, Congress, subjects, bill_type)
+            SELECT BillNumber, Title, DateIntroduced, Congress, subjects, bill_type FROM bills_stage ORDER BY seq
+            ON CONFLICT (BillNumber) DO NOTHING;
+        """)
+        total_inserted_count = cur.rowcount; conn.commit(); print(f"Inserted {total_inserted_count} laws.")
 
         overall_end_time = time.time()
+        rebuild_bills_indexes(conn); indexes_rebuilt = True
+        # VACUUM also sets the visibility map, without which the covering indexes still visit the heap
+        print("Vacuuming and updating planner statistics..."); conn.commit(); conn.autocommit = True
+        cur.execute("VACUUM ANALYZE Bills;"); conn.autocommit = False
+        flush_api_cache() # BillIDs were renumbered and Votes emptied, so cached vote responses are stale
+
         print(f"\n--- OVERALL SUCCESS ---")
         print(f"Processed {total_xml_files_processed} XML files from all ZIP archives.")
         cur.execute("SELECT COUNT(*) FROM Bills;"); final_count = cur.fetchone()[0]
@@ -175,6 +254,10 @@ def parse_and_insert_enacted_laws_fast(base_path):
         if conn:
             try: cur.close()
             except: pass
+            # Never leave Bills without its indexes, even when the load failed part-way
+            if not indexes_rebuilt and not conn.closed:
+                try: conn.rollback(); rebuild_bills_indexes(conn)
+                except Exception: pass # rebuild_bills_indexes already reported it
             conn.close(); print("DB connection closed.")
 
 # Run the main function
@@ -4,26 +4,56 @@ import io
 import csv
 import psycopg2
 import time
+import functools
 import requests
-from psycopg2.extras import execute_values
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import config # Import config
+from api_cache import flush_api_cache
 
 # --- CONFIGURATION ---
 DB_CONNECTION_STRING = config.DB_CONNECTION_STRING
 FEC_DATA_FOLDER_PATH = config.FEC_DATA_FOLDER_PATH
-BATCH_SIZE = 5000 
+BATCH_SIZE = 100000 # itcont donations staged per COPY, so a file never sits in memory whole
+ZIP_READ_BUFFER_SIZE = 1 << 20 # Decompress pas2/itcont entries in 1 MB reads instead of TextIOWrapper's 8 KB
+
+# Dropped before a reload and rebuilt afterwards. Donors' unique key stays: the load's donor lookups use it.
+# { index_name: definition }
+DONATION_SECONDARY_INDEXES = {
+    # Trigram index so the API's '%name%' ILIKE search is an index scan, not a seq scan
+    'idx_donors_search_trgm': "ON Donors USING gin ((Name || ' ' || COALESCE(Employer, '')) gin_trgm_ops)",
+    'idx_donors_name_prefix': "ON Donors (lower(Name) text_pattern_ops)", # Two-letter API searches
+    'idx_donors_employer_prefix': "ON Donors (lower(Employer) text_pattern_ops)",
+    # A donor's history in the API's newest-first order (DonationID breaks same-day ties), read without touching the heap
+    'idx_donations_donor_date': "ON Donations (DonorID, Date DESC, DonationID DESC) INCLUDE (Amount, PoliticianID)",
+}
 
 # --- Global Lookups ---
 fec_id_to_politician_id_lookup = {} # { fec_candidate_id: politician_id }
 fec_committee_name_lookup = {}      # { fec_committee_id: 'Committee Name' }
 fec_cmte_to_cand_id_lookup = {}     # { fec_committee_id: fec_candidate_id }
-donor_db_lookup = {}                # { (lower_donor_name, lower_type, lower_employer, state): donor_id }
+fec_cmte_to_politician_id_lookup = {} # { fec_committee_id: politician_id }, the two maps above composed
 
 # --- FEC Data File Headers (Simplified) ---
 CM_HEADERS = ['CMTE_ID', 'CMTE_NM', 'CMTE_PTY_AFFILIATION', 'CMTE_TP']
 CCL_HEADERS = ['CAND_ID', 'CAND_ELECTION_YR', 'FEC_ELECTION_YR', 'CMTE_ID', 'CMTE_TP', 'CMTE_DSGN', 'LINKAGE_ID']
 PAS2_HEADERS = ['CMTE_ID', 'AMNDT_IND', 'RPT_TP', 'TRANSACTION_PGI', 'IMAGE_NUM', 'TRANSACTION_TP', 'ENTITY_TP', 'NAME', 'CITY', 'STATE', 'ZIP_CODE', 'EMPLOYER', 'OCCUPATION', 'TRANSACTION_DT', 'TRANSACTION_AMT', 'OTHER_ID', 'CAND_ID', 'TRAN_ID', 'FILE_NUM', 'MEMO_CD', 'MEMO_TEXT', 'SUB_ID']
 ITCONT_HEADERS = ['CMTE_ID', 'AMNDT_IND', 'RPT_TP', 'TRANSACTION_PGI', 'IMAGE_NUM', 'TRANSACTION_TP', 'ENTITY_TP', 'NAME', 'CITY', 'STATE', 'ZIP_CODE', 'EMPLOYER', 'OCCUPATION', 'TRANSACTION_DT', 'TRANSACTION_AMT', 'OTHER_ID', 'TRAN_ID', 'FILE_NUM', 'MEMO_CD', 'MEMO_TEXT', 'SUB_ID']
+# Column positions read directly from each row, instead of building a dict per row (short rows raise IndexError and are skipped)
+CM_CMTE_ID_IDX, CM_CMTE_NM_IDX = CM_HEADERS.index('CMTE_ID'), CM_HEADERS.index('CMTE_NM')
+CCL_CAND_ID_IDX, CCL_CMTE_ID_IDX = CCL_HEADERS.index('CAND_ID'), CCL_HEADERS.index('CMTE_ID')
+PAS2_CMTE_ID_IDX, PAS2_NAME_IDX, PAS2_CAND_ID_IDX = PAS2_HEADERS.index('CMTE_ID'), PAS2_HEADERS.index('NAME'), PAS2_HEADERS.index('CAND_ID')
+PAS2_TRANSACTION_DT_IDX, PAS2_TRANSACTION_AMT_IDX = PAS2_HEADERS.index('TRANSACTION_DT'), PAS2_HEADERS.index('TRANSACTION_AMT')
+ITCONT_CMTE_ID_IDX, ITCONT_TRANSACTION_TP_IDX = ITCONT_HEADERS.index('CMTE_ID'), ITCONT_HEADERS.index('TRANSACTION_TP')
+ITCONT_NAME_IDX, ITCONT_STATE_IDX, ITCONT_EMPLOYER_IDX = ITCONT_HEADERS.index('NAME'), ITCONT_HEADERS.index('STATE'), ITCONT_HEADERS.index('EMPLOYER')
+ITCONT_TRANSACTION_DT_IDX, ITCONT_TRANSACTION_AMT_IDX = ITCONT_HEADERS.index('TRANSACTION_DT'), ITCONT_HEADERS.index('TRANSACTION_AMT')
+ITCONT_OTHER_ID_IDX = ITCONT_HEADERS.index('OTHER_ID')
+EARMARKED_TRANSACTION_TYPES = frozenset(['15E', '15Z'])
+ITCONT_SPLIT_COUNT = ITCONT_OTHER_ID_IDX + 1 # Nothing after OTHER_ID is read, so the rest of the line stays unsplit
+# Shortest row each parser can read, checked up front instead of catching IndexError per row
+CM_MIN_ROW_LENGTH = max(CM_CMTE_ID_IDX, CM_CMTE_NM_IDX) + 1
+CCL_MIN_ROW_LENGTH = max(CCL_CAND_ID_IDX, CCL_CMTE_ID_IDX) + 1
+PAS2_MIN_ROW_LENGTH = max(PAS2_CMTE_ID_IDX, PAS2_NAME_IDX, PAS2_CAND_ID_IDX, PAS2_TRANSACTION_DT_IDX, PAS2_TRANSACTION_AMT_IDX) + 1
+ITCONT_MIN_ROW_LENGTH = ITCONT_OTHER_ID_IDX + 1
 
 # URLs for the individual contribution files
 INDIV_FILE_URLS = [
@@ -42,11 +72,11 @@ INDIV_FILE_URLS = [
 ]
 
 # --- Helper Functions ---
+@functools.lru_cache(maxsize=16384) # A few thousand distinct dates cover every contribution row
 def parse_fec_date(date_str):
     # Converts FEC date (MMDDYYYY) to YYYY-MM-DD or None.
     if not date_str or len(date_str) != 8: return None
-    try: return f"{date_str[4:8]}-{date_str[0:2]}-{date_str[2:4]}"
-    except: return None
+    return f"{date_str[4:8]}-{date_str[0:2]}-{date_str[2:4]}"
 
 # --- Database Functions ---
 def clear_donation_tables(conn):
@@ -56,13 +86,140 @@ def clear_donation_tables(conn):
         cur.execute("DELETE FROM Donations;"); cur.execute("DELETE FROM Donors;");
         cur.execute("ALTER SEQUENCE Donations_DonationID_seq RESTART WITH 1;");
         cur.execute("ALTER SEQUENCE Donors_DonorID_seq RESTART WITH 1;");
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;");
+        # Secondary indexes are rebuilt in one pass after the load (see rebuild_donation_indexes)
+        for index_name in DONATION_SECONDARY_INDEXES: cur.execute(f"DROP INDEX IF EXISTS {index_name};")
         conn.commit(); print("Tables cleared successfully.")
     except Exception as e: print(f"Error clearing tables: {e}"); conn.rollback(); raise e
     finally: cur.close()
 
-def load_fec_lookups(conn, fec_folder_path):
+def rebuild_donation_indexes(conn):
+    # Recreates DONATION_SECONDARY_INDEXES; building each index once is far cheaper than updating it per row.
+    print("Rebuilding Donors/Donations indexes..."); cur = conn.cursor()
+    try:
+        cur.execute("SET maintenance_work_mem = '256MB';")
+        for index_name, definition in DONATION_SECONDARY_INDEXES.items():
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} {definition};")
+        conn.commit(); print("Indexes rebuilt.")
+    except Exception as e: print(f"Error rebuilding indexes: {e}"); conn.rollback(); raise e
+    finally: cur.close()
+
+def create_donations_stage(conn):
+    # Creates the session's staging table that COPY loads before rows move into Donors and Donations.
+    # Donations are staged with their raw donor columns; DonorIDs are resolved server-side.
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE donations_stage (
+            PoliticianID INT, Amount NUMERIC, Date DATE, ContributionType TEXT,
+            DonorName TEXT, DonorType TEXT, Employer TEXT, State TEXT
+        ) ON COMMIT DELETE ROWS;
+    """)
+    conn.commit(); cur.close()
+
+def copy_donations(cur, donation_rows):
+    # COPYs (PoliticianID, Amount, Date, DonorType, DonorName, Employer, State) rows into donations_stage, adds the
+    # donors not yet in Donors, then inserts the donations joined to their DonorIDs. Returns the donations inserted.
+    # donations_stage is emptied first, so several batches can share one transaction; the caller commits.
+    cur.execute("TRUNCATE donations_stage;")
+    copy_buffer = io.StringIO(); writer = csv.writer(copy_buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for politician_id, amount, date, donor_type, donor_name, employer, state in donation_rows:
+        writer.writerow((politician_id, amount, date, donor_type, donor_name, donor_type, employer, state))
+    copy_buffer.seek(0)
+    # Every text field is quoted, so '' stays an empty name; FORCE_NULL stores a missing employer/state as NULL
+    cur.copy_expert("""
+        COPY donations_stage (PoliticianID, Amount, Date, ContributionType, DonorName, DonorType, Employer, State)
+        FROM STDIN WITH (FORMAT csv, FORCE_NULL (Employer, State))
+    """, copy_buffer)
+    # NULL employer/state never conflict on the unique key, so existing donors are skipped explicitly
+    cur.execute("""
+        INSERT INTO Donors (Name, DonorType, Employer, State)
+        SELECT DISTINCT s.DonorName, s.DonorType, s.Employer, s.State FROM donations_stage s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Donors d
+            WHERE d.Name = s.DonorName AND d.DonorType = s.DonorType
+              AND COALESCE(d.Employer, '') = COALESCE(s.Employer, '') AND COALESCE(d.State, '') = COALESCE(s.State, '')
+        )
+        ON CONFLICT (Name, DonorType, Employer, State) DO NOTHING;
+    """)
+    print(f"  Added {cur.rowcount} new donors.")
+    cur.execute("""
+        INSERT INTO Donations (DonorID, PoliticianID, Amount, Date, ContributionType)
+        SELECT d.DonorID, s.PoliticianID, s.Amount, s.Date, s.ContributionType
+        FROM donations_stage s
+        JOIN Donors d ON d.Name = s.DonorName AND d.DonorType = s.DonorType
+            AND COALESCE(d.Employer, '') = COALESCE(s.Employer, '') AND COALESCE(d.State, '') = COALESCE(s.State, '')
+        ON CONFLICT DO NOTHING;
+    """)
+    return cur.rowcount
+
+def refresh_donation_totals(conn):
+    # Creates (first run) and refreshes the per-politician, per-donor summary rows the API's donation summary reads.
+    # Donor columns are copied in so the endpoint is one indexed read with no join to Donors.
+    print("Refreshing 'politician_donation_summary' materialized view..."); cur = conn.cursor()
+    try:
+        cur.execute("DROP MATERIALIZED VIEW IF EXISTS politician_donor_totals;") # Superseded by politician_donation_summary
+        cur.execute("""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS politician_donation_summary AS
+            SELECT d.PoliticianID, d.DonorID, dn.Name AS DonorName, dn.DonorType, dn.Employer, dn.State AS DonorState,
+                   SUM(d.Amount) AS TotalAmount
+            FROM Donations d
+            JOIN Donors dn ON d.DonorID = dn.DonorID
+            GROUP BY d.PoliticianID, d.DonorID, dn.Name, dn.DonorType, dn.Employer, dn.State;
+        """)
+        # The unique index is required for REFRESH ... CONCURRENTLY
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pds_politician_donor ON politician_donation_summary (PoliticianID, DonorID);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_pds_politician_amount ON politician_donation_summary (PoliticianID, TotalAmount DESC);")
+        cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY politician_donation_summary;")
+        conn.commit(); print("Materialized view refreshed.")
+    except Exception as e: print(f"Error refreshing materialized view: {e}"); conn.rollback(); raise e
+    finally: cur.close()
+
+def parse_cm_file(filepath):
+    # Reads one cm.zip in a worker process. Returns { fec_committee_id: 'Committee Name' }.
+    committee_names = {}
+    try:
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
+            with zf.open(data_filename, 'r') as f:
+                reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
+                for row in reader:
+                    if len(row) < CM_MIN_ROW_LENGTH: continue
+                    cmte_id, cmte_name = row[CM_CMTE_ID_IDX], row[CM_CMTE_NM_IDX]
+                    if cmte_id and cmte_name:
+                        committee_names[cmte_id] = cmte_name.strip()
+    except Exception as e: print(f"    Warning: Could not process {os.path.basename(filepath)}: {e}")
+    return committee_names
+
+def parse_ccl_file(filepath):
+    # Reads one ccl.zip in a worker process. Returns { fec_committee_id: fec_candidate_id }.
+    committee_candidates = {}
+    try:
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
+            with zf.open(data_filename, 'r') as f:
+                reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
+                for row in reader:
+                    if len(row) < CCL_MIN_ROW_LENGTH: continue
+                    cmte_id = row[CCL_CMTE_ID_IDX]; cand_id = row[CCL_CAND_ID_IDX]
+                    if cmte_id and cand_id: committee_candidates[cmte_id] = cand_id
+    except Exception as e: print(f"    Warning: Could not process {os.path.basename(filepath)}: {e}")
+    return committee_candidates
+
+def scan_fec_folder(fec_folder_path):
+    # Lists the FEC folder once and buckets its zips by file prefix, each bucket sorted by name (so by cycle).
+    # Returns { 'cm': [...], 'ccl': [...], 'pas2': [...] }.
+    fec_files = {'cm': [], 'ccl': [], 'pas2': []}
+    with os.scandir(fec_folder_path) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.zip'): continue
+            for prefix, filenames in fec_files.items():
+                if entry.name.startswith(prefix): filenames.append(entry.name)
+    for filenames in fec_files.values(): filenames.sort()
+    return fec_files
+
+def load_fec_lookups(conn, fec_folder_path, fec_files):
     # Loads all FEC lookup maps: Politician Map (DB), Committees (file), and Committee-to-Candidate (file).
-    global fec_id_to_politician_id_lookup, fec_committee_name_lookup, fec_cmte_to_cand_id_lookup
+    global fec_id_to_politician_id_lookup, fec_committee_name_lookup, fec_cmte_to_cand_id_lookup, fec_cmte_to_politician_id_lookup
     cur = conn.cursor()
     
     # 1. Load the map we built from the DB
@@ -75,111 +232,33 @@ def load_fec_lookups(conn, fec_folder_path):
 
     # 2. Build Committee Name lookup from local cm.zip files
     print("Building FEC Committee lookup from local files...")
-    cm_files = sorted([f for f in os.listdir(fec_folder_path) if f.startswith('cm') and f.endswith('.zip')])
+    cm_files = fec_files['cm']
     if not cm_files: print("Error: 'cm.zip' files not found."); raise FileNotFoundError
-        
-    for filename in cm_files:
-        filepath = os.path.join(fec_folder_path, filename)
-        try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
-                with zf.open(data_filename, 'r') as f:
-                    reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
-                    for row in reader:
-                        try:
-                            record = dict(zip(CM_HEADERS, row))
-                            if record.get('CMTE_ID') and record.get('CMTE_NM'):
-                                fec_committee_name_lookup[record['CMTE_ID']] = record['CMTE_NM'].strip()
-                        except: continue
-        except Exception as e: print(f"    Warning: Could not process {filename}: {e}")
+    # Each cycle's file parses in its own process; map() keeps file order, so later cycles still win
+    with ProcessPoolExecutor() as executor:
+        for committee_names in executor.map(parse_cm_file, [os.path.join(fec_folder_path, f) for f in cm_files]):
+            fec_committee_name_lookup.update(committee_names)
     print(f"Loaded {len(fec_committee_name_lookup)} committee names.")
 
     # 3. Build Committee-to-Candidate lookup from local ccl.zip files
     print("Building FEC Committee-to-Candidate lookup from local files...")
-    ccl_files = sorted([f for f in os.listdir(fec_folder_path) if f.startswith('ccl') and f.endswith('.zip')])
+    ccl_files = fec_files['ccl']
     if not ccl_files: print("Error: 'ccl.zip' files not found."); raise FileNotFoundError
-        
-    for filename in ccl_files:
-        filepath = os.path.join(fec_folder_path, filename)
-        try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
-                with zf.open(data_filename, 'r') as f:
-                    reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
-                    for row in reader:
-                        try:
-                            record = dict(zip(CCL_HEADERS, row))
-                            cmte_id = record.get('CMTE_ID'); cand_id = record.get('CAND_ID')
-                            if cmte_id and cand_id: fec_cmte_to_cand_id_lookup[cmte_id] = cand_id
-                        except: continue
-        except Exception as e: print(f"    Warning: Could not process {filename}: {e}")
+    with ProcessPoolExecutor() as executor:
+        for committee_candidates in executor.map(parse_ccl_file, [os.path.join(fec_folder_path, f) for f in ccl_files]):
+            fec_cmte_to_cand_id_lookup.update(committee_candidates)
     print(f"Loaded {len(fec_cmte_to_cand_id_lookup)} committee-to-candidate links.")
 
+    # 4. Compose committee -> candidate -> politician once, so each itcont row needs a single lookup
+    for cmte_id, cand_id in fec_cmte_to_cand_id_lookup.items():
+        politician_id = fec_id_to_politician_id_lookup.get(cand_id)
+        if politician_id: fec_cmte_to_politician_id_lookup[cmte_id] = politician_id
+    print(f"Linked {len(fec_cmte_to_politician_id_lookup)} committees to politicians.")
 
-def update_donor_lookup(conn, cur, new_donor_keys):
-    # Batch inserts new donors and updates the global donor_db_lookup cache.
-    global donor_db_lookup
-    if not new_donor_keys:
-        return
-    
-    donors_to_insert = [
-        (key[0], key[1], key[2] if key[2] else None, key[3] if key[3] else None) 
-        for key in new_donor_keys
-    ]
-    
-    print(f"  Found {len(donors_to_insert)} new unique donors. Batch inserting them...")
-    
-    sql_insert_donors = """
-        INSERT INTO Donors (Name, DonorType, Employer, State)
-        VALUES %s
-        ON CONFLICT (Name, DonorType, Employer, State) DO NOTHING;
-    """
-    temp_table_name = "new_donor_keys_temp"
-
-    try:
-        execute_values(cur, sql_insert_donors, donors_to_insert, template=None, page_size=BATCH_SIZE)
-        conn.commit() 
-
-        print("  Refreshing donor cache (single join query)...")
-        cur.execute(f"DROP TABLE IF EXISTS {temp_table_name};")
-        cur.execute(f"CREATE TEMPORARY TABLE {temp_table_name} (name TEXT, donortype TEXT, employer TEXT, state TEXT) ON COMMIT DROP;")
-        
-        if donors_to_insert: # Only insert if list is not empty
-            execute_values(cur, f"INSERT INTO {temp_table_name} (name, donortype, employer, state) VALUES %s",
-                           donors_to_insert, template=None, page_size=BATCH_SIZE)
 
-        cur.execute(f"""
-            SELECT d.DonorID, d.Name, d.DonorType, d.Employer, d.State
-            FROM Donors d
-            JOIN {temp_table_name} temp
-            ON d.Name = temp.name
-            AND d.DonorType = temp.donortype
-            AND COALESCE(d.Employer, '') = COALESCE(temp.employer, '')
-            AND COALESCE(d.State, '') = COALESCE(temp.state, '');
-        """)
-        
-        rows = cur.fetchall()
-        for row in rows:
-            donor_id, name, donortype, employer, state = row
-            key = (str(name or '').strip().lower(),
-                   str(donortype or '').strip().lower(),
-                   str(employer or '').strip().lower(),
-                   str(state or '').strip().lower())
-            donor_db_lookup[key] = donor_id
-        
-        print(f"  Donor cache updated with {len(rows)} new/found IDs.")
-        conn.commit()
-
-    except psycopg2.Error as e:
-        print(f"  DB error in update_donor_lookup: {e}. Rolling back.");
-        conn.rollback()
-        cur = conn.cursor()
-        return
-
-def process_pas2_files(conn, cur, fec_folder_path):
+def process_pas2_files(conn, cur, fec_folder_path, pas2_files):
     # Processes all local pas2.zip files.
     print(f"\n--- Stage 1: Processing local PAC-to-Candidate files (pas2) ---")
-    pas2_files = sorted([f for f in os.listdir(fec_folder_path) if f.startswith('pas2') and f.endswith('.zip')])
     if not pas2_files: print("No local 'pas2XX.zip' files found."); return 0
     
     total_pas2_inserted = 0
@@ -187,148 +266,158 @@ def process_pas2_files(conn, cur, fec_folder_path):
     for filename in pas2_files:
         filepath = os.path.join(fec_folder_path, filename); print(f"Processing {filename}...")
         file_start_time = time.time(); file_donations_added = 0
-        donations_to_process = [] 
-        new_donor_keys = set()    
+        donations_to_stage = []
 
         try:
             with zipfile.ZipFile(filepath, 'r') as zf:
                 data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
                 with zf.open(data_filename, 'r') as f:
-                    reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
+                    buffered = io.BufferedReader(f, buffer_size=ZIP_READ_BUFFER_SIZE)
+                    reader = csv.reader(io.TextIOWrapper(buffered, encoding='latin-1', newline=''), delimiter='|')
                     for i, row in enumerate(reader):
                         if (i+1) % 10000 == 0: print(f"  Processed {i+1} rows...", end='\r')
-                        try:
-                            record = dict(zip(PAS2_HEADERS, row))
-                            amount = float(record.get('TRANSACTION_AMT', 0))
-                            if amount <= 2000.0: continue
-                            date = parse_fec_date(record.get('TRANSACTION_DT')); fec_cmte_id = record.get('CMTE_ID'); fec_cand_id = record.get('CAND_ID')
-                            politician_id = fec_id_to_politician_id_lookup.get(fec_cand_id)
-                            if not politician_id: continue
-                            
-                            donor_name = fec_committee_name_lookup.get(fec_cmte_id, record.get('NAME', 'Unknown Committee')); donor_type = 'PAC/Party'
-                            donor_key = (donor_name.lower(), donor_type.lower(), '', '') 
-                            
-                            if politician_id and date:
-                                donations_to_process.append((politician_id, amount, date, donor_type, donor_key))
-                                if donor_key not in donor_db_lookup: new_donor_keys.add((donor_name, donor_type, None, None))
-                        except: continue
+                        if len(row) < PAS2_MIN_ROW_LENGTH: continue
+                        raw_amount = row[PAS2_TRANSACTION_AMT_IDX]
+                        if not raw_amount: continue
+                        try: amount = float(raw_amount)
+                        except ValueError: continue
+                        if amount <= 2000.0: continue
+                        date = parse_fec_date(row[PAS2_TRANSACTION_DT_IDX]); fec_cmte_id = row[PAS2_CMTE_ID_IDX]; fec_cand_id = row[PAS2_CAND_ID_IDX]
+                        politician_id = fec_id_to_politician_id_lookup.get(fec_cand_id)
+                        if not politician_id: continue
+                        
+                        donor_name = fec_committee_name_lookup.get(fec_cmte_id, row[PAS2_NAME_IDX]); donor_type = 'PAC/Party'
+                        
+                        if politician_id and date:
+                            donations_to_stage.append((politician_id, amount, date, donor_type, donor_name, None, None))
         except Exception as e: print(f"  Error processing {filename}: {e}"); continue
         
-        print(f"\n  Finished reading {filename}. Found {len(donations_to_process)} donations > $2000.")
-        
-        update_donor_lookup(conn, cur, new_donor_keys)
+        print(f"\n  Finished reading {filename}. Found {len(donations_to_stage)} donations > $2000.")
         
-        donations_to_batch_insert = []
-        for pol_id, amount, date, donor_type, donor_key in donations_to_process:
-            donor_id = donor_db_lookup.get(donor_key) 
-            if donor_id:
-                donations_to_batch_insert.append((donor_id, pol_id, amount, date, donor_type)); file_donations_added += 1
-        if donations_to_batch_insert:
-            print(f"  Inserting {len(donations_to_batch_insert)} donation records...")
-            execute_values(cur, "INSERT INTO Donations (DonorID, PoliticianID, Amount, Date, ContributionType) VALUES %s ON CONFLICT DO NOTHING;", donations_to_batch_insert)
-            total_pas2_inserted += len(donations_to_batch_insert)
+        if donations_to_stage:
+            print(f"  Inserting {len(donations_to_stage)} donation records...")
+            try: file_donations_added = copy_donations(cur, donations_to_stage); total_pas2_inserted += file_donations_added
+            except psycopg2.Error as db_err: print(f"  DB error inserting {filename}: {db_err}. Rolling back."); conn.rollback(); continue
         
         conn.commit(); print(f"--- Finished {filename} in {time.time() - file_start_time:.2f}s. Added {file_donations_added} donations. ---")
     
     print(f"Stage 1 Complete. Inserted {total_pas2_inserted} PAC/Party donations.")
     return total_pas2_inserted
 
+def download_indiv_file(url, filepath):
+    # Streams one indiv zip to disk. Returns True on success; runs on the prefetch thread.
+    filename = os.path.basename(filepath)
+    print(f"\nDownloading {filename}...")
+    try:
+        with requests.get(url, stream=True) as r:
+            r.raise_for_status()
+            with open(filepath, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=1024*1024): f.write(chunk)
+        print(f"Download of {filename} complete."); return True
+    except Exception as e: print(f"  Error downloading {filename}: {e}. Skipping."); return False
+
 def process_indiv_files(conn, cur, fec_folder_path):
     # Downloads, processes, and deletes individual (itcont) zip files one by one.
+    # The next zip downloads in the background while the current one is parsed; at most one waits on disk.
     print(f"\n--- Stage 2: Processing Individual Contribution files (itcont) ---")
     total_indiv_inserted = 0
+    filepaths = [os.path.join(fec_folder_path, url.split('/')[-1]) for url in INDIV_FILE_URLS]
+    # Leaving the block waits for any in-flight download, so an error never leaves the prefetch thread running on its own
+    with ThreadPoolExecutor(max_workers=1) as downloader:
+        next_download = downloader.submit(download_indiv_file, INDIV_FILE_URLS[0], filepaths[0])
     
-    for url in INDIV_FILE_URLS:
-        filename = url.split('/')[-1]; filepath = os.path.join(fec_folder_path, filename); file_start_time = time.time()
-        
-        print(f"\nDownloading {filename}...")
-        try:
-            with requests.get(url, stream=True) as r:
-                r.raise_for_status()
-                with open(filepath, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192*10): f.write(chunk)
-            print("Download complete.")
-        except Exception as e: print(f"  Error downloading {filename}: {e}. Skipping."); continue
+        for file_index, filepath in enumerate(filepaths):
+            filename = os.path.basename(filepath)
+            downloaded = next_download.result()
+            if file_index + 1 < len(filepaths):
+                next_download = downloader.submit(download_indiv_file, INDIV_FILE_URLS[file_index + 1], filepaths[file_index + 1])
+            if not downloaded: continue
+            file_start_time = time.time()
             
-        print(f"Processing {filename}...")
-        file_donations_added = 0; donations_to_process = []; new_donor_keys = set()
-        try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
-                with zf.open(data_filename, 'r') as f:
-                    reader = csv.reader(io.TextIOWrapper(f, encoding='latin-1'), delimiter='|')
-                    for i, row in enumerate(reader):
-                        if (i+1) % 50000 == 0: print(f"  Processed {i+1} rows...", end='\r')
-                        try:
-                            record = dict(zip(ITCONT_HEADERS, row))
-                            amount = float(record.get('TRANSACTION_AMT', 0))
-                            transaction_type = record.get('TRANSACTION_TP', '').upper()
-                            
+            print(f"Processing {filename}...")
+            file_donations_added = 0; file_donations_found = 0; donations_to_stage = []
+            try:
+                with zipfile.ZipFile(filepath, 'r') as zf:
+                    data_filename = [f for f in zf.namelist() if f.endswith('.txt')][0]
+                    with zf.open(data_filename, 'r') as f:
+                        # FEC bulk files are unquoted '|'-delimited text, so a plain split matches csv.reader
+                        # and only splits out the columns we use
+                        buffered = io.BufferedReader(f, buffer_size=ZIP_READ_BUFFER_SIZE)
+                        for i, line in enumerate(io.TextIOWrapper(buffered, encoding='latin-1', newline='')):
+                            if (i+1) % 50000 == 0: print(f"  Processed {i+1} rows...", end='\r')
+                            row = line.rstrip('\r\n').split('|', ITCONT_SPLIT_COUNT)
+                            if len(row) < ITCONT_MIN_ROW_LENGTH: continue
+                            raw_amount = row[ITCONT_TRANSACTION_AMT_IDX]
+                            if not raw_amount: continue
+                            try: amount = float(raw_amount)
+                            except ValueError: continue
+                            transaction_type = row[ITCONT_TRANSACTION_TP_IDX].upper()
+                        
                             # --- CORRECTED FILTER ---
                             if amount <= 2000.0 or not transaction_type.startswith('15'):
                                 continue
-                            is_earmarked = transaction_type in ['15E', '15Z']
-                            if record.get('OTHER_ID') and not is_earmarked: 
+                            is_earmarked = transaction_type in EARMARKED_TRANSACTION_TYPES
+                            if row[ITCONT_OTHER_ID_IDX] and not is_earmarked: 
                                 continue # Skip if it has an OTHER_ID but isn't earmarked
                             # --- END CORRECTION ---
-                            
-                            date = parse_fec_date(record.get('TRANSACTION_DT')); fec_cmte_id = record.get('CMTE_ID') 
-                            donor_name, donor_employer, donor_state = record.get('NAME'), record.get('EMPLOYER'), record.get('STATE')
+                        
+                            date = parse_fec_date(row[ITCONT_TRANSACTION_DT_IDX]); fec_cmte_id = row[ITCONT_CMTE_ID_IDX] 
+                            donor_name, donor_employer, donor_state = row[ITCONT_NAME_IDX], row[ITCONT_EMPLOYER_IDX], row[ITCONT_STATE_IDX]
                             donor_type = 'Individual'
-                            
-                            fec_cand_id = fec_cmte_to_cand_id_lookup.get(fec_cmte_id)
-                            if not fec_cand_id: continue
-                            politician_id = fec_id_to_politician_id_lookup.get(fec_cand_id)
+                        
+                            politician_id = fec_cmte_to_politician_id_lookup.get(fec_cmte_id)
                             if not politician_id: continue 
-                            
-                            donor_key = (str(donor_name or '').strip().lower(), donor_type.lower(), str(donor_employer or '').strip().lower(), str(donor_state or '').strip().lower())
-                            
+                        
                             if politician_id and date and donor_name and donor_state:
-                                donations_to_process.append((politician_id, amount, date, donor_type, donor_key))
-                                if donor_key not in donor_db_lookup:
-                                    new_donor_keys.add((donor_name, donor_type, donor_employer, donor_state))
-                        except: continue
-        except Exception as e: print(f"  Error processing {filename}: {e}")
-        
-        print(f"\n  Finished reading {filename}. Found {len(donations_to_process)} donations > $2000.")
+                                donations_to_stage.append((politician_id, amount, date, donor_type, donor_name, donor_employer, donor_state))
+                                file_donations_found += 1
+
+                            if len(donations_to_stage) >= BATCH_SIZE:
+                                print(" " * 80, end='\r'); print(f"  Inserting batch of {len(donations_to_stage)} donation records...")
+                                file_donations_added += copy_donations(cur, donations_to_stage); donations_to_stage.clear()
+            except psycopg2.Error as db_err:
+                print(f"\n  DB error inserting {filename}: {db_err}. Rolling back."); conn.rollback()
+                file_donations_added = 0; donations_to_stage.clear()
+            except Exception as e: print(f"  Error processing {filename}: {e}")
         
-        update_donor_lookup(conn, cur, new_donor_keys)
+            print(f"\n  Finished reading {filename}. Found {file_donations_found} donations > $2000.")
         
-        donations_to_batch_insert = []
-        for pol_id, amount, date, donor_type, donor_key in donations_to_process:
-            donor_id = donor_db_lookup.get(donor_key) 
-            if donor_id:
-                donations_to_batch_insert.append((donor_id, pol_id, amount, date, donor_type)); file_donations_added += 1
+            if donations_to_stage:
+                print(f"  Inserting final {len(donations_to_stage)} donation records...")
+                try: file_donations_added += copy_donations(cur, donations_to_stage)
+                except psycopg2.Error as db_err: print(f"  DB error inserting {filename}: {db_err}. Rolling back."); conn.rollback(); file_donations_added = 0
+            total_indiv_inserted += file_donations_added
         
-        if donations_to_batch_insert:
-            print(f"  Inserting {len(donations_to_batch_insert)} donation records...")
-            execute_values(cur, "INSERT INTO Donations (DonorID, PoliticianID, Amount, Date, ContributionType) VALUES %s ON CONFLICT DO NOTHING;", donations_to_batch_insert)
-            total_indiv_inserted += len(donations_to_batch_insert)
+            conn.commit(); print(f"--- Finished {filename} in {time.time() - file_start_time:.2f}s. Added {file_donations_added} donations. ---")
         
-        conn.commit(); print(f"--- Finished {filename} in {time.time() - file_start_time:.2f}s. Added {file_donations_added} donations. ---")
-        
-        try: os.remove(filepath); print(f"Successfully deleted {filename}.")
-        except Exception as e: print(f"  Warning: Could not delete {filename}: {e}")
-            
+            try: os.remove(filepath); print(f"Successfully deleted {filename}.")
+            except Exception as e: print(f"  Warning: Could not delete {filename}: {e}")
+
     print(f"\nStage 2 Complete. Inserted {total_indiv_inserted} individual donations.")
     return total_indiv_inserted
 
 # --- Main Execution ---
 def main():
-    conn = None
+    conn = None; indexes_rebuilt = False
     try:
         print("Connecting to Supabase..."); conn = psycopg2.connect(DB_CONNECTION_STRING)
         
         # Load the FEC-to-Politician map from the DB
         # and the Committee/CCL maps from local files
-        load_fec_lookups(conn, FEC_DATA_FOLDER_PATH) 
+        fec_files = scan_fec_folder(FEC_DATA_FOLDER_PATH)
+        load_fec_lookups(conn, FEC_DATA_FOLDER_PATH, fec_files) 
         
         # Clear tables and start processing
-        clear_donation_tables(conn); cur = conn.cursor()
+        clear_donation_tables(conn); create_donations_stage(conn); cur = conn.cursor()
+        # A failed load is simply re-run from scratch, so losing the last commits on a crash is harmless
+        cur.execute("SET synchronous_commit = off;")
         overall_start_time = time.time()
         
-        pac_donations = process_pas2_files(conn, cur, FEC_DATA_FOLDER_PATH)
+        pac_donations = process_pas2_files(conn, cur, FEC_DATA_FOLDER_PATH, fec_files['pas2'])
         indiv_donations = process_indiv_files(conn, cur, FEC_DATA_FOLDER_PATH)
+        rebuild_donation_indexes(conn); indexes_rebuilt = True
+        refresh_donation_totals(conn)
+        flush_api_cache()
 
         print(f"\n--- OVERALL SUCCESS ---")
         cur.execute("SELECT COUNT(*) FROM Donors;"); final_donor_count = cur.fetchone()[0]
@@ -344,6 +433,10 @@ def main():
         if conn:
             try: cur.close()
             except: pass
+            # Never leave Donors/Donations without their indexes, even when the load failed part-way
+            if not indexes_rebuilt and not conn.closed:
+                try: conn.rollback(); rebuild_donation_indexes(conn)
+                except Exception: pass # rebuild_donation_indexes already reported it
             conn.close(); print("Database connection closed.")
 
 if __name__ == "__main__":
@@ -1,11 +1,20 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+import io
+import csv
+try:
+    from orjson import loads as json_loads # Several times faster than the stdlib decoder
+except ImportError:
+    from json import loads as json_loads
 import psycopg2
 import time
-from psycopg2.extras import execute_values
 import re 
 import sys
 import os
 import config
+from api_cache import flush_api_cache
 
 # --- CONFIGURATION ---
 DB_CONNECTION_STRING = config.DB_CONNECTION_STRING
@@ -14,12 +23,58 @@ CONGRESS_GOV_API_KEY = config.CONGRESS_GOV_API_KEY
 START_CONGRESS = 108 # Per Corey's update
 END_CONGRESS = 119   # Current Congress
 CURRENT_CONGRESS = 119 # Used to set IsActive flag
-BATCH_SIZE = 1000
+# Stage 2 normally derives current members from the CURRENT_CONGRESS list Stage 1 already fetched;
+# set True to crawl the API's currentMember=true listing instead (e.g. to catch a mid-term appointee).
+FETCH_CURRENT_MEMBERS = False
 API_PAGE_DELAY = 0.3
+REQUEST_TIMEOUT = (5, 30) # (connect, read) seconds; a stalled socket becomes a retry instead of a hang
+# Every Congress is fetched at once (a dozen small crawls, well inside the API's hourly limit);
+# each still waits API_PAGE_DELAY between its own pages
+FETCH_WORKERS = END_CONGRESS - START_CONGRESS + 1
+
+# Dropped before a reload and rebuilt after Stage 1; the PK and UNIQUE key stay for ON CONFLICT.
+# { index_name: definition }
+POLITICIANS_SECONDARY_INDEXES = {
+    # Trigram index so the API's '%name%' ILIKE search is an index scan, not a seq scan
+    'idx_politicians_search_trgm': "ON Politicians USING gin ((COALESCE(LastName, '') || ' ' || COALESCE(FirstName, '') || ' ' || COALESCE(Role, '')) gin_trgm_ops)",
+    # Two-letter searches have no trigram, so the API matches them as last-name, first-name or role prefixes
+    'idx_politicians_lastname_prefix': "ON Politicians (lower(LastName) text_pattern_ops)",
+    'idx_politicians_firstname_prefix': "ON Politicians (lower(FirstName) text_pattern_ops)",
+    'idx_politicians_role_prefix': "ON Politicians (lower(Role) text_pattern_ops)",
+    # The IsActive update matches on lowercased keys
+    'idx_politicians_lower_key': "ON Politicians (LOWER(FirstName), LOWER(LastName), LOWER(State))",
+}
+
+# --- Current Governors ---
+# (first, last, state) of sitting governors; this list must be manually updated as governors change.
+# Stored lowercased, the same as the other active-official keys.
+CURRENT_GOVERNORS = [ 
+    ('kay', 'ivey', 'alabama'), ('mike', 'dunleavy', 'alaska'), ('lemanu peleti', 'mauga', 'american samoa'), 
+    ('katie', 'hobbs', 'arizona'), ('sarah huckabee', 'sanders', 'arkansas'), ('gavin', 'newsom', 'california'),
+    ('jared', 'polis', 'colorado'), ('ned', 'lamont', 'connecticut'), ('john', 'carney', 'delaware'), 
+    ('ron', 'desantis', 'florida'), ('brian', 'kemp', 'georgia'), ('lou', 'leon guerrero', 'guam'),
+    ('josh', 'green', 'hawaii'), ('brad', 'little', 'idaho'), ('j. b.', 'pritzker', 'illinois'),
+    ('mike', 'braun', 'indiana'), ('kim', 'reynolds', 'iowa'), ('laura', 'kelly', 'kansas'),
+    ('andy', 'beshear', 'kentucky'), ('jeff', 'landry', 'louisiana'), ('janet', 'mills', 'maine'),
+    ('wes', 'moore', 'maryland'), ('maura', 'healey', 'massachusetts'), ('gretchen', 'whitmer', 'michigan'),
+    ('tim', 'walz', 'minnesota'), ('tate', 'reeves', 'mississippi'), ('mike', 'kehoe', 'missouri'),
+    ('greg', 'gianforte', 'montana'), ('jim', 'pillen', 'nebraska'), ('joe', 'lombardo', 'nevada'),
+    ('kelly', 'ayotte', 'new hampshire'), ('phil', 'murphy', 'new jersey'), ('michelle', 'lujan grisham', 'new mexico'),
+    ('kathy', 'hochul', 'new york'), ('josh', 'stein', 'north carolina'), ('kelly', 'armstrong', 'north dakota'),
+    ('david', 'apatang', 'northern mariana islands'), ('mike', 'dewine', 'ohio'), ('kevin', 'stitt', 'oklahoma'),
+    ('tina', 'kotek', 'oregon'), ('josh', 'shapiro', 'pennsylvania'), ('jenniffer', 'gonzález-colón', 'puerto rico'),
+    ('daniel', 'mckee', 'rhode island'), ('henry', 'mcmaster', 'south carolina'), ('larry', 'rhoden', 'south dakota'),
+    ('bill', 'lee', 'tennessee'), ('greg', 'abbott', 'texas'), ('spencer', 'cox', 'utah'),
+    ('phil', 'scott', 'vermont'), ('albert', 'bryan', 'virgin islands'), ('glenn', 'youngkin', 'virginia'),
+    ('bob', 'ferguson', 'washington'), ('patrick', 'morrisey', 'west virginia'), ('tony', 'evers', 'wisconsin'),
+    ('mark', 'gordon', 'wyoming')
+    ]
+CURRENT_GOVERNORS_KEYS = frozenset((fname.lower(), lname.lower(), state.lower()) for fname, lname, state in CURRENT_GOVERNORS)
 
 # --- Global Lookups ---
 politician_db_lookup = {}
-global_unique_politicians = set()
+# { (FirstName, LastName, State): politician row tuple }, first-seen Congress wins
+global_unique_politicians = {}
     
 def clear_politicians_table(conn):
     """Deletes all rows from the Politicians table and ensures Role column exists."""
@@ -34,6 +89,9 @@ def clear_politicians_table(conn):
                 END IF;
             END $$;
         """)
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        # Secondary indexes are rebuilt in one pass after the load (see rebuild_politicians_indexes)
+        for index_name in POLITICIANS_SECONDARY_INDEXES: cur.execute(f"DROP INDEX IF EXISTS {index_name};")
         cur.execute("DELETE FROM Politicians;")
         cur.execute("ALTER SEQUENCE Politicians_PoliticianID_seq RESTART WITH 1;")
         conn.commit()
@@ -41,141 +99,185 @@ def clear_politicians_table(conn):
     except Exception as e:
         print(f"Error clearing table: {e}"); conn.rollback(); raise e
 
+def create_politicians_indexes(cur, index_names):
+    """Creates the named POLITICIANS_SECONDARY_INDEXES inside the caller's transaction; existing ones are skipped."""
+    for index_name in index_names:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} {POLITICIANS_SECONDARY_INDEXES[index_name]};")
+
+def rebuild_politicians_indexes(conn):
+    """Recreates POLITICIANS_SECONDARY_INDEXES in one pass instead of maintaining them per row."""
+    print("Rebuilding Politicians indexes..."); cur = conn.cursor()
+    try:
+        create_politicians_indexes(cur, POLITICIANS_SECONDARY_INDEXES)
+        conn.commit(); print("Indexes rebuilt.")
+    except Exception as e: print(f"Error rebuilding indexes: {e}"); conn.rollback(); raise e
+    finally: cur.close()
+
+def create_politicians_stage(conn):
+    """Creates the session's staging table that COPY loads before rows move into Politicians."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE politicians_stage (
+            seq SERIAL, FirstName TEXT, LastName TEXT, Party TEXT, Chamber TEXT,
+            State TEXT, District INT, IsActive BOOLEAN, Role TEXT
+        ) ON COMMIT DELETE ROWS;
+    """)
+    conn.commit(); cur.close()
+
+def copy_politicians(cur, politician_rows):
+    """COPYs (FirstName, LastName, Party, Chamber, State, District, IsActive, Role) rows into
+    politicians_stage, then moves them into Politicians in their original order. The caller commits."""
+    copy_buffer = io.StringIO(); writer = csv.writer(copy_buffer, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerows(politician_rows); copy_buffer.seek(0)
+    # Every text field is quoted, so '' stays an empty name; FORCE_NULL turns a missing party/district back into NULL
+    cur.copy_expert("""
+        COPY politicians_stage (FirstName, LastName, Party, Chamber, State, District, IsActive, Role)
+        FROM STDIN WITH (FORMAT csv, FORCE_NULL (Party, District))
+    """, copy_buffer)
+    cur.execute("""
+        INSERT INTO Politicians (FirstName, LastName, Party, Chamber, State, District, IsActive, Role)
+        SELECT FirstName, LastName, Party, Chamber, State, District, IsActive, Role FROM politicians_stage ORDER BY seq
+        ON CONFLICT (FirstName, LastName, State) DO NOTHING;
+    """)
+
 def fetch_members_generic(session, params):
-    """Fetches members based on provided parameters, handling pagination correctly."""
+    """Fetches members based on provided parameters, handling pagination correctly.
+    Crawls run on several threads at once, so progress is one summary line per crawl, not per page."""
     api_url_base = "https://api.congress.gov/v3/member"
-    headers = {"X-Api-Key": CONGRESS_GOV_API_KEY}
     all_members = []
-    limit = params.get("limit", 250)
     page_count = 0
-    current_params = params.copy()
-    fetch_url = api_url_base
+    # The first page is built from params; every later page is the API's 'next' link as-is
+    fetch_url = api_url_base; request_params = params
 
     while True:
         page_count += 1
-        print(f"  Fetching page {page_count}...", end='\r')
-        request_params = None
-        if "next_url" in current_params:
-            fetch_url = current_params["next_url"]
-        else:
-            fetch_url = api_url_base
-            request_params = current_params.copy()
-            if "next_url" in request_params: del request_params["next_url"]
-
         try:
-            response = session.get(fetch_url, headers=headers, params=request_params)
+            # The session's adapter has already retried by the time an error surfaces here
+            response = session.get(fetch_url, params=request_params, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as req_err:
-             print(f"\n  Network error page {page_count}: {req_err}. Retrying..."); time.sleep(10)
-             try:
-                 response = session.get(fetch_url, headers=headers, params=request_params)
-                 response.raise_for_status(); data = response.json()
-             except requests.exceptions.RequestException as req_err2:
-                 print(f"\n  Retry failed page {page_count}: {req_err2}. Skipping fetch."); return []
+            data = json_loads(response.content)
+        except (requests.exceptions.RequestException, ValueError) as req_err: # ValueError: undecodable body
+            print(f"  {params}: fetch failed page {page_count} after retries: {req_err}. Skipping fetch."); return []
 
         members_page = data.get('members', [])
-        if not members_page:
-             print(" " * 80, end='\r'); print(f"  Received empty list on page {page_count}. Assuming end.")
-             break
+        if not members_page: break # An empty page means the listing is exhausted
         all_members.extend(members_page)
 
         pagination = data.get('pagination', {}); next_url = pagination.get('next')
-        if not next_url:
-             print(" " * 80, end='\r'); print(f"  No 'next' link. Finished fetching."); break
-        current_params = {"next_url": next_url}
+        if not next_url: break
+        fetch_url = next_url; request_params = None
         time.sleep(API_PAGE_DELAY)
 
-    print(" " * 80, end='\r')
-    print(f"Finished fetching. Total members found: {len(all_members)}")
+    print(f"  {params}: fetched {len(all_members)} members in {page_count} pages.")
     return all_members
 
 
+def split_member_name(full_name):
+    """Splits a Congress.gov 'Last, First' name into (first_name, last_name)."""
+    if ',' in full_name:
+        last_name, first_name = full_name.split(',', 1)
+        return first_name.strip(), last_name.strip()
+    return "", full_name.strip()
+
+def is_serving_member(member):
+    """True if the member's latest term is still open (no endYear), i.e. they haven't left office."""
+    try: return not (member.get('terms') or {}).get('item')[-1].get('endYear')
+    except (IndexError, TypeError, AttributeError): return False
+
+def parse_member(member):
+    """Turns one Congress.gov member into a Politicians row tuple
+    (FirstName, LastName, Party, Chamber, State, District, IsActive=False, Role), or None to skip it."""
+    district = None
+    state = member.get('state')
+    if not state: return None
+    try:
+        terms_item = (member.get('terms') or {}).get('item') # No throwaway default containers per member
+        if not terms_item: return None
+        latest_term = terms_item[-1]
+        latest_term_chamber = latest_term.get('chamber')
+    except (IndexError, TypeError, AttributeError): return None
+    if latest_term_chamber == 'House of Representatives': db_chamber_name = 'House'; role = 'Representative'
+    elif latest_term_chamber == 'Senate': db_chamber_name = 'Senate'; role = 'Senator'
+    else: return None
+    if db_chamber_name == 'House':
+        district_str = member.get('District')
+        if district_str is None: district_str = latest_term.get('district', '0')
+        try: district = int(district_str) # One parse; '' or non-numeric values fall through to None
+        except (ValueError, TypeError): district = None
+    first_name, last_name = split_member_name(member.get('name', ''))
+    if not (first_name or last_name): return None
+    return (first_name, last_name, member.get('partyName'), db_chamber_name, state, district, False, role)
+
 def update_active_status(conn, cur, current_members_keys):
-    """Updates IsActive=True using a temporary table for matching."""
+    """Updates IsActive=True using a temporary table for matching.
+    Runs inside the caller's load transaction; on error only this step is rolled back, and the caller commits."""
     print(f"\nUpdating IsActive status for {len(current_members_keys)} identified current politicians...")
     if not current_members_keys: print("No current members identified."); return 0
     temp_table_name = "active_politician_keys"
     keys_list = list(current_members_keys)
     try:
+        cur.execute("SAVEPOINT active_update;")
         print(f"Creating temp table '{temp_table_name}'...");
         cur.execute(f"DROP TABLE IF EXISTS {temp_table_name};")
         cur.execute(f"""
             CREATE TEMPORARY TABLE {temp_table_name} (fname TEXT, lname TEXT, state TEXT, PRIMARY KEY (fname, lname, state))
             ON COMMIT DROP;
         """)
-        print(f"Inserting {len(keys_list)} keys into temp table...");
-        insert_sql = f"INSERT INTO {temp_table_name} (fname, lname, state) VALUES %s;"
-        execute_values(cur, insert_sql, keys_list, template=None, page_size=BATCH_SIZE)
+        print(f"Copying {len(keys_list)} keys into temp table...");
+        # Temp tables already skip WAL; COPY skips the per-row INSERT parsing too
+        copy_buffer = io.StringIO(); csv.writer(copy_buffer, quoting=csv.QUOTE_ALL).writerows(keys_list) # Quoted '' stays '', not NULL
+        copy_buffer.seek(0)
+        cur.copy_expert(f"COPY {temp_table_name} (fname, lname, state) FROM STDIN WITH (FORMAT csv)", copy_buffer)
+        cur.execute(f"ANALYZE {temp_table_name};") # Autovacuum never analyzes temp tables, so give the planner real row counts
         print("Performing UPDATE...");
         update_sql = f"""
             UPDATE Politicians p SET IsActive = TRUE FROM {temp_table_name} temp
-            WHERE p.FirstName = temp.fname AND p.LastName = temp.lname AND p.State = temp.state;
+            WHERE LOWER(p.FirstName) = temp.fname AND LOWER(p.LastName) = temp.lname AND LOWER(p.State) = temp.state;
         """
         cur.execute(update_sql); updated_count = cur.rowcount
-        conn.commit(); print(f"Successfully updated IsActive for {updated_count} politicians.")
+        cur.execute("RELEASE SAVEPOINT active_update;"); print(f"Successfully updated IsActive for {updated_count} politicians.")
         return updated_count
     except psycopg2.Error as db_err:
-        print(f"  DB error during IsActive update: {db_err}"); conn.rollback(); return 0
+        print(f"  DB error during IsActive update: {db_err}"); cur.execute("ROLLBACK TO SAVEPOINT active_update;"); return 0
 
 def insert_politicians_final_active():
     """Final version: Inserts all as inactive, then updates active based on currentMember filter."""
-    conn = None; total_processed_api_records = 0; session = requests.Session()
+    conn = None; indexes_rebuilt = False; total_processed_api_records = 0; session = requests.Session()
+    # One kept-alive socket per fetch thread; urllib3 retries failed pages (honouring 429 Retry-After) with backoff
+    retry = Retry(total=5, connect=3, read=3, status=3, backoff_factor=1.0, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=frozenset(["GET"]), respect_retry_after_header=True)
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS, max_retries=retry))
+    session.headers.update({"X-Api-Key": CONGRESS_GOV_API_KEY}) # requests already asks for gzip and keeps connections alive
     try:
         print("Connecting..."); conn = psycopg2.connect(DB_CONNECTION_STRING)
-        clear_politicians_table(conn); cur = conn.cursor(); start_time = time.time()
+        clear_politicians_table(conn); create_politicians_stage(conn); cur = conn.cursor(); start_time = time.time()
+        # A failed load is simply re-run from scratch, so losing the last commits on a crash is harmless
+        cur.execute("SET synchronous_commit = off;")
         
         # --- Stage 1: Insert ALL unique politicians as IsActive = False ---
         print("\n--- Stage 1: Inserting all historical politicians as INACTIVE ---")
-        for congress_num in range(START_CONGRESS, END_CONGRESS + 1):
+        # The fetches are network-bound, so they run on threads; map() hands results back in
+        # Congress order, which keeps "first-seen Congress wins" below unchanged.
+        congress_nums = list(range(START_CONGRESS, END_CONGRESS + 1))
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            congress_members = list(executor.map(
+                lambda n: fetch_members_generic(session, {"congress": n, "limit": 250, "format": "json"}), congress_nums))
+        members_by_congress = dict(zip(congress_nums, congress_members))
+        for congress_num, members_list in members_by_congress.items():
             congress_start_time = time.time(); print(f"\n--- Processing Congress {congress_num} ---")
-            params = {"congress": congress_num, "limit": 250, "format": "json"}
-            members_list = fetch_members_generic(session, params)
             if not members_list: print(f"Skipping Congress {congress_num}."); continue
 
-            politicians_this_congress = {}; processed_in_congress = 0
             print(f"Parsing and de-duplicating {len(members_list)} members...")
-            for member in members_list:
-                processed_in_congress += 1; total_processed_api_records += 1
-                db_chamber_name = None; district = None; role = None
-                try: 
-                    latest_term = member.get('terms', {}).get('item', [{}])[-1]
-                    latest_term_chamber = latest_term.get('chamber')
-                    if latest_term_chamber == 'House of Representatives': db_chamber_name = 'House'; role = 'Representative'
-                    elif latest_term_chamber == 'Senate': db_chamber_name = 'Senate'; role = 'Senator'
-                    else: continue
-                except (IndexError, TypeError, AttributeError): continue
-                if db_chamber_name == 'House':
-                    district_str = member.get('District')
-                    if district_str is None: district_str = latest_term.get('district', '0')
-                    try: district = int(district_str) if str(district_str).isdigit() else None
-                    except (ValueError, TypeError): district = None
-                full_name = member.get('name', '')
-                first_name = ""; last_name = ""
-                if ',' in full_name: parts = full_name.split(',', 1); last_name = parts[0].strip(); first_name = parts[1].strip()
-                else: last_name = full_name.strip()
-                party = member.get('partyName'); state = member.get('state')
-                if not first_name and not last_name: continue
-                if not state: continue
-                unique_key = (first_name, last_name, state)
-                politicians_this_congress[unique_key] = (first_name, last_name, party, db_chamber_name, state, district, False, role) # IsActive = False
-                global_unique_politicians.add(unique_key)
+            total_processed_api_records += len(members_list)
+            # Keyed by (FirstName, LastName, State); members parse_member rejects are dropped, and a later duplicate replaces an earlier one
+            politicians_this_congress = {(row[0], row[1], row[4]): row for row in filter(None, map(parse_member, members_list))}
 
-            politicians_to_batch = list(politicians_this_congress.values())
-            print(f"Found {len(politicians_to_batch)} unique for Congress {congress_num}. Batch inserting (as inactive)...")
-            if politicians_to_batch:
-                sql_insert = """
-                    INSERT INTO Politicians (FirstName, LastName, Party, Chamber, State, District, IsActive, Role)
-                    VALUES %s
-                    ON CONFLICT (FirstName, LastName, State) DO NOTHING;
-                """
-                try:
-                    execute_values(cur, sql_insert, politicians_to_batch, template=None, page_size=BATCH_SIZE)
-                    conn.commit(); print(f"Batch insert successful.")
-                except psycopg2.Error as db_err:
-                     print(f"  DB batch error (Stage 1): {db_err}. Rolling back."); conn.rollback(); cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM Politicians;"); current_total_rows = cur.fetchone()[0]
-            print(f"  Finished Congress {congress_num} in {time.time() - congress_start_time:.2f}s. Total unique in table: {current_total_rows}")
+            # Politicians already seen in an earlier Congress keep that record
+            new_this_congress = 0
+            for unique_key, politician_row in politicians_this_congress.items():
+                if unique_key not in global_unique_politicians:
+                    global_unique_politicians[unique_key] = politician_row; new_this_congress += 1
+            print(f"  Finished Congress {congress_num} in {time.time() - congress_start_time:.2f}s. {new_this_congress} new, {len(global_unique_politicians)} unique so far.")
 
         # --- Stage 1b: Manually add Presidents (since 108th Congress) ---
         print("\n--- Stage 1b: Inserting Presidents ---")
@@ -186,27 +288,28 @@ def insert_politicians_final_active():
             ('Joe', 'Biden', 'Democrat', 'DE', False, 'President'), # 46th term
             # 47th term for Trump will be handled by the update stage
         ]
-        presidents_to_insert = []
+        new_presidents = 0
         for pres in presidents:
             fname, lname, party, state, is_active, role = pres
             unique_key_tuple = (fname.lower(), lname.lower(), state.lower())
             # Check against global set to avoid duplicates
             if unique_key_tuple not in global_unique_politicians:
-                 presidents_to_insert.append((fname, lname, party, 'Executive', state, None, is_active, role))
-                 global_unique_politicians.add(unique_key_tuple)
+                 global_unique_politicians[unique_key_tuple] = (fname, lname, party, 'Executive', state, None, is_active, role)
+                 new_presidents += 1
+        print(f"Queued {new_presidents} new presidents.")
 
-        if presidents_to_insert:
-             print(f"Batch inserting {len(presidents_to_insert)} new presidents...")
-             sql_pres_insert = """
-                 INSERT INTO Politicians (FirstName, LastName, Party, Chamber, State, District, IsActive, Role)
-                 VALUES %s
-                 ON CONFLICT (FirstName, LastName, State) DO NOTHING;
-             """
-             try:
-                 execute_values(cur, sql_pres_insert, presidents_to_insert, template=None, page_size=BATCH_SIZE)
-                 conn.commit(); print("President insert successful.")
-             except psycopg2.Error as db_err:
-                  print(f"  DB batch error (Presidents): {db_err}. Rolling back."); conn.rollback(); cur = conn.cursor()
+        # One load for every Congress and the presidents: each politician is sent once instead of once per term.
+        # Stage 1 and Stage 2 share one transaction, committed once with the index rebuild; the
+        # savepoint lets a failed load be undone without losing the session.
+        politicians_to_batch = list(global_unique_politicians.values())
+        print(f"\nBatch inserting {len(politicians_to_batch)} unique politicians (as inactive)...")
+        if politicians_to_batch:
+            try:
+                cur.execute("SAVEPOINT stage_1;")
+                copy_politicians(cur, politicians_to_batch)
+                cur.execute("RELEASE SAVEPOINT stage_1;"); print(f"Batch insert successful.")
+            except psycopg2.Error as db_err:
+                 print(f"  DB batch error (Stage 1): {db_err}. Rolling back."); cur.execute("ROLLBACK TO SAVEPOINT stage_1;")
 
         # --- Stage 1c: Governors ---
         print("\n--- Stage 1c: Governors (Manual SQL) ---")
@@ -214,17 +317,19 @@ def insert_politicians_final_active():
         
         # --- Stage 2: Fetch *CURRENT* members/officials and Update IsActive ---
         print("\n--- Stage 2: Identifying and updating ACTIVE politicians ---")
-        print("Fetching currently serving federal members...")
-        current_member_params = {"currentMember": "true", "limit": 250, "format": "json"}
-        current_members_list = fetch_members_generic(session, current_member_params)
+        if FETCH_CURRENT_MEMBERS:
+            print("Fetching currently serving federal members...")
+            current_member_params = {"currentMember": "true", "limit": 250, "format": "json"}
+            current_members_list = fetch_members_generic(session, current_member_params)
+        else:
+            print(f"Taking currently serving federal members from Congress {CURRENT_CONGRESS}...")
+            current_members_list = [member for member in members_by_congress.get(CURRENT_CONGRESS) or [] if is_serving_member(member)]
         
         current_officials_keys = set()
         if current_members_list:
             print(f"Parsing {len(current_members_list)} currently serving federal members...")
             for member in current_members_list:
-                full_name = member.get('name', ''); first_name = ""; last_name = ""
-                if ',' in full_name: parts = full_name.split(',', 1); last_name = parts[0].strip(); first_name = parts[1].strip()
-                else: last_name = full_name.strip()
+                first_name, last_name = split_member_name(member.get('name', ''))
                 state = member.get('state')
                 if state and (first_name or last_name):
                     current_officials_keys.add((first_name.lower(), last_name.lower(), state.lower()))
@@ -233,36 +338,15 @@ def insert_politicians_final_active():
         # --- Manually add Current President & Governors ---
         print("Adding manually specified active Presidents and Governors...")
         current_officials_keys.add(('donald', 'trump', 'fl')) # 47th President
-        
-        # This list must be manually updated as governors change
-        current_governors = [ 
-            ('kay', 'ivey', 'alabama'), ('mike', 'dunleavy', 'alaska'), ('lemanu peleti', 'mauga', 'american samoa'), 
-            ('katie', 'hobbs', 'arizona'), ('sarah huckabee', 'sanders', 'arkansas'), ('gavin', 'newsom', 'california'),
-            ('jared', 'polis', 'colorado'), ('ned', 'lamont', 'connecticut'), ('john', 'carney', 'delaware'), 
-            ('ron', 'desantis', 'florida'), ('brian', 'kemp', 'georgia'), ('lou', 'leon guerrero', 'guam'),
-            ('josh', 'green', 'hawaii'), ('brad', 'little', 'idaho'), ('j. b.', 'pritzker', 'illinois'),
-            ('mike', 'braun', 'indiana'), ('kim', 'reynolds', 'iowa'), ('laura', 'kelly', 'kansas'),
-            ('andy', 'beshear', 'kentucky'), ('jeff', 'landry', 'louisiana'), ('janet', 'mills', 'maine'),
-            ('wes', 'moore', 'maryland'), ('maura', 'healey', 'massachusetts'), ('gretchen', 'whitmer', 'michigan'),
-            ('tim', 'walz', 'minnesota'), ('tate', 'reeves', 'mississippi'), ('mike', 'kehoe', 'missouri'),
-            ('greg', 'gianforte', 'montana'), ('jim', 'pillen', 'nebraska'), ('joe', 'lombardo', 'nevada'),
-            ('kelly', 'ayotte', 'new hampshire'), ('phil', 'murphy', 'new jersey'), ('michelle', 'lujan grisham', 'new mexico'),
-            ('kathy', 'hochul', 'new york'), ('josh', 'stein', 'north carolina'), ('kelly', 'armstrong', 'north dakota'),
-            ('david', 'apatang', 'northern mariana islands'), ('mike', 'dewine', 'ohio'), ('kevin', 'stitt', 'oklahoma'),
-            ('tina', 'kotek', 'oregon'), ('josh', 'shapiro', 'pennsylvania'), ('jenniffer', 'gonzález-colón', 'puerto rico'),
-            ('daniel', 'mckee', 'rhode island'), ('henry', 'mcmaster', 'south carolina'), ('larry', 'rhoden', 'south dakota'),
-            ('bill', 'lee', 'tennessee'), ('greg', 'abbott', 'texas'), ('spencer', 'cox', 'utah'),
-            ('phil', 'scott', 'vermont'), ('albert', 'bryan', 'virgin islands'), ('glenn', 'youngkin', 'virginia'),
-            ('bob', 'ferguson', 'washington'), ('patrick', 'morrisey', 'west virginia'), ('tony', 'evers', 'wisconsin'),
-            ('mark', 'gordon', 'wyoming')
-        ]
-        # Normalize keys from manual list
-        for gov_fname, gov_lname, gov_state in current_governors:
-             current_officials_keys.add((gov_fname.lower(), gov_lname.lower(), gov_state.lower()))
+        current_officials_keys.update(CURRENT_GOVERNORS_KEYS)
         
         print(f"Identified {len(current_officials_keys)} unique currently serving officials (Congress + manual adds).")
         
+        # The IsActive UPDATE joins on the lowercased key, so that index is built (uncommitted) before it runs
+        create_politicians_indexes(cur, ['idx_politicians_lower_key']); cur.execute("ANALYZE Politicians;")
         update_active_status(conn, cur, current_officials_keys)
+        rebuild_politicians_indexes(conn); indexes_rebuilt = True # Builds the rest and commits Stage 1 and Stage 2 together
+        flush_api_cache() # PoliticianIDs were renumbered, so cached search/detail responses now point at other people
 
         # --- Final Report ---
         end_time = time.time(); print(f"\n--- OVERALL SUCCESS ---")
@@ -281,6 +365,10 @@ def insert_politicians_final_active():
         if conn:
             try: cur.close()
             except: pass
+            # Never leave Politicians without its indexes, even when the load failed part-way
+            if not indexes_rebuilt and not conn.closed:
+                try: rebuild_politicians_indexes(conn)
+                except Exception: pass # rebuild_politicians_indexes already reported it
             conn.close(); print("Database connection closed.")
 
 if __name__ == "__main__":
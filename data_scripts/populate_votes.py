@@ -1,16 +1,36 @@
 import os
+import io
+import struct
 import json
+try:
+    from orjson import loads as json_loads # Several times faster than the stdlib decoder
+except ImportError:
+    from json import loads as json_loads
+try:
+    import ijson # Yields one member at a time instead of materializing the whole file
+except ImportError:
+    ijson = None
 import psycopg2
 import time
-from psycopg2.extras import execute_values
 import re
+import functools
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import config
+from api_cache import flush_api_cache
 
 # --- CONFIGURATION ---
 DB_CONNECTION_STRING = config.DB_CONNECTION_STRING
 VOTE_DATA_FOLDER_PATH = config.VOTE_DATA_FOLDER_PATH
 MEMBER_FILE_PATH = config.MEMBER_FILE_PATH
-BATCH_SIZE = 5000 
+BATCH_SIZE = 100000 # Rows buffered per COPY into votes_stage
+
+# Dropped before a reload and rebuilt afterwards; the primary key stays.
+# { index_name: definition }
+VOTES_SECONDARY_INDEXES = {
+    # Lets the API read a politician's votes with an index-only scan
+    'idx_votes_politician': "ON Votes (PoliticianID) INCLUDE (BillID, Vote)",
+}
 
 # --- STATE ABBREVIATION MAP ---
 STATE_ABBREVIATION_MAP = {
@@ -27,15 +47,15 @@ STATE_ABBREVIATION_MAP = {
     'VI': 'virgin islands', 'VA': 'virginia', 'WA': 'washington', 'WV': 'west virginia',
     'WI': 'wisconsin', 'WY': 'wyoming'
 }
-STATE_ABBREVIATION_MAP.update({k.lower(): v for k, v in STATE_ABBREVIATION_MAP.items()})
 
 
 # --- Global Lookups ---
-# { (cleaned_lastname, cleaned_state): [ (PoliticianID, cleaned_firstname), ... ] }
-politician_db_lookup = {}
+politician_full_lookup = {}     # {(cleaned_firstname, cleaned_lastname, cleaned_state): PoliticianID}
+politician_lname_lookup = {}    # {(cleaned_lastname, cleaned_state): PoliticianID, or None if several share the key}
 bill_db_lookup = {}       # {normalized_bill_number: bill_id}
 icpsr_lookup = {}         # {icpsr_id: (cleaned_firstname, cleaned_lastname, cleaned_full_state_name)}
 rollcall_lookup = {}      # {(congress, rollnumber, chamber): bill_id}
+icpsr_politician_lookup = {} # {icpsr_id: PoliticianID}, only for members that matched
 
 # Voteview cast_code mapping
 VOTEVIEW_CODE_MAP = {
@@ -44,20 +64,34 @@ VOTEVIEW_CODE_MAP = {
     7: 'Not Voting', 8: 'Not Voting', 9: 'Not Voting', 0: 'Not Voting'
 }
 
+# --- Binary COPY framing for votes_stage (PoliticianID INT, BillID INT, Vote TEXT) ---
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0) # Signature, flags, no header extension
+PGCOPY_TRAILER = struct.pack("!h", -1)
+VOTE_ROW_PREFIX = struct.Struct("!hiiii") # Field count, then length + value for each INT column
+# The Vote column only ever holds these strings, so their length-prefixed bytes are built once
+VOTE_FIELD_BYTES = {vote: struct.pack("!i", len(vote.encode())) + vote.encode() for vote in set(VOTEVIEW_CODE_MAP.values())}
+
+# --- Name Cleaning Patterns (compiled once; the cleaners run for every member and politician) ---
+NAME_PUNCTUATION_TABLE = str.maketrans(".,()", "    ") # Punctuation -> space
+NAME_SUFFIXES = (" jr", " sr", " ii", " iii", " iv", " md", " phd")
+PARENTHETICAL_PATTERN = re.compile(r"\s*\([^\)]*\)") # e.g. ' (Dem)'
+BILL_KEY_DELETE_TABLE = str.maketrans("", "", " .") # Drops spaces and dots in one pass
+
 # --- Helper Functions ---
+@functools.lru_cache(maxsize=None) # Politicians and members share many name parts
 def clean_name_part(name_part):
     """Aggressively cleans a name part to its simplest form."""
     if not name_part: return ""
     name = str(name_part).lower().strip()
-    name = re.sub(r"[.,\(\)]", " ", name) # Replace punctuation with space
-    name = re.sub(r"\s+(jr|sr|ii|iii|iv|md|phd)$", "", name, flags=re.IGNORECASE) # Remove suffixes
-    name = name.split(' ')[0].strip()
-    return name
+    name = name.translate(NAME_PUNCTUATION_TABLE) # Replace punctuation with space
+    if name.endswith(NAME_SUFFIXES): name = name[:name.rindex(' ')] # Remove suffixes
+    return name.partition(' ')[0].strip()
 
+@functools.lru_cache(maxsize=None) # Members reappear in every Congress of HSall_members.json
 def normalize_voteview_bioname(bioname_str):
     """Cleans Voteview bioname data, e.g., 'PELOSI, Nancy P (Dem)' -> ('nancy', 'pelosi')."""
     name = str(bioname_str or '').strip().lower()
-    name = re.sub(r"\s*\([^\)]*\)", "", name).strip() # Remove (Nickname) or (Party)
+    name = PARENTHETICAL_PATTERN.sub("", name).strip() # Remove (Nickname) or (Party)
     
     cleaned_fname = ""; cleaned_lname = ""
     if ',' in name:
@@ -73,18 +107,48 @@ def normalize_voteview_bioname(bioname_str):
             cleaned_lname = clean_name_part(parts[0])
     return (cleaned_fname, cleaned_lname)
 
+def normalize_bill_key(bill_number):
+    """Normalizes a bill number for matching, e.g., 'H.R. 1' -> 'hr1'. Used for both DB bills and roll calls."""
+    return str(bill_number or '').strip().lower().translate(BILL_KEY_DELETE_TABLE)
+
 # --- Database Functions ---
 def clear_votes_table(conn):
     print("Clearing 'Votes' table..."); cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM Votes;");
-        cur.execute("ALTER SEQUENCE Votes_VoteID_seq RESTART WITH 1;");
+        # Secondary indexes are rebuilt in one pass after the load (see rebuild_votes_indexes)
+        for index_name in VOTES_SECONDARY_INDEXES: cur.execute(f"DROP INDEX IF EXISTS {index_name};")
+        cur.execute("TRUNCATE TABLE Votes RESTART IDENTITY;") # Leaves no dead tuples and resets VoteID in one step
         conn.commit(); print("Table cleared.")
     except Exception as e: print(f"Error clearing: {e}"); conn.rollback(); raise e
 
+def rebuild_votes_indexes(conn):
+    """Recreates VOTES_SECONDARY_INDEXES; building each btree once is far cheaper than updating it per row."""
+    print("Rebuilding Votes indexes..."); cur = conn.cursor()
+    try:
+        cur.execute("SET maintenance_work_mem = '256MB';")
+        for index_name, definition in VOTES_SECONDARY_INDEXES.items():
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} {definition};")
+        conn.commit(); print("Indexes rebuilt.")
+    except Exception as e: print(f"Error rebuilding indexes: {e}"); conn.rollback(); raise e
+    finally: cur.close()
+
+def create_votes_stage(conn):
+    """Creates the staging table that vote batches are COPYed into before one INSERT into Votes."""
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE votes_stage (PoliticianID INT, BillID INT, Vote TEXT) ON COMMIT DROP;")
+    cur.close() # Lives until the single commit at the end of the load
+
+def copy_votes_batch(cur, vote_rows):
+    """Streams (PoliticianID, BillID, Vote) tuples into votes_stage with one binary COPY (no text parsing server-side)."""
+    pack_prefix = VOTE_ROW_PREFIX.pack
+    copy_buffer = io.BytesIO(); copy_buffer.write(PGCOPY_HEADER)
+    copy_buffer.write(b"".join(pack_prefix(3, 4, pid, 4, bid) + VOTE_FIELD_BYTES[vote] for pid, bid, vote in vote_rows))
+    copy_buffer.write(PGCOPY_TRAILER); copy_buffer.seek(0)
+    cur.copy_expert("COPY votes_stage (PoliticianID, BillID, Vote) FROM STDIN WITH (FORMAT binary)", copy_buffer)
+
 def load_db_lookups(conn):
     """Loads Politicians and Bills from Supabase."""
-    global politician_db_lookup, bill_db_lookup
+    global politician_full_lookup, politician_lname_lookup, bill_db_lookup
     cur = conn.cursor()
     print("Loading Politicians lookup from DB (Cleaned)...");
     cur.execute("SELECT PoliticianID, FirstName, LastName, State FROM Politicians")
@@ -94,18 +158,17 @@ def load_db_lookups(conn):
         cleaned_lname = clean_name_part(lname)
         cleaned_state = str(state or '').strip().lower() # e.g., 'new jersey'
         key = (cleaned_lname, cleaned_state) # Key = (lastname, full_state_name)
-        if key not in politician_db_lookup:
-            politician_db_lookup[key] = []
-        politician_db_lookup[key].append( (pid, cleaned_fname) )
-    print(f"Loaded {len(politician_db_lookup)} unique (LastName, State) keys.")
+        # A (lastname, state) shared by several politicians is ambiguous; those fall back to the first-name key
+        politician_lname_lookup[key] = None if key in politician_lname_lookup else pid
+        politician_full_lookup.setdefault((cleaned_fname, cleaned_lname, cleaned_state), pid)
+    print(f"Loaded {len(politician_lname_lookup)} unique (LastName, State) keys.")
     
     print("Loading Bills lookup from DB...");
     # We must adjust this to only load bills from 108th+
     cur.execute(f"SELECT BillID, BillNumber FROM Bills WHERE Congress >= {config.START_CONGRESS}");
     for row in cur.fetchall():
         bid, bnumber = row
-        key = str(bnumber or '').strip().lower().replace(" ", "").replace(".", "")
-        bill_db_lookup[key] = bid
+        bill_db_lookup[normalize_bill_key(bnumber)] = bid
     print(f"Loaded {len(bill_db_lookup)} enacted bills."); cur.close()
 
 def load_icpsr_lookup(member_filepath):
@@ -113,17 +176,19 @@ def load_icpsr_lookup(member_filepath):
     global icpsr_lookup
     print(f"Loading ICPSR mapping from {member_filepath}...")
     try:
-        with open(member_filepath, 'r', encoding='utf-8') as f: member_data = json.load(f)
-        for member in member_data:
-            icpsr = member.get('icpsr')
-            state_abbr = member.get('state_abbrev', '').strip().upper()
-            bioname = member.get('bioname', '') 
-            
-            full_state_name = STATE_ABBREVIATION_MAP.get(state_abbr, '').lower()
-            fname_clean, lname_clean = normalize_voteview_bioname(bioname)
-            
-            if icpsr and full_state_name and (fname_clean or lname_clean):
-                icpsr_lookup[icpsr] = (fname_clean, lname_clean, full_state_name)
+        with open(member_filepath, 'rb') as f:
+            member_data = ijson.items(f, 'item') if ijson else json.load(f)
+            get_state_name = STATE_ABBREVIATION_MAP.get # Bound once; looked up for every member
+            for member in member_data:
+                icpsr = member.get('icpsr')
+                state_abbr = member.get('state_abbrev', '').strip().upper()
+                bioname = member.get('bioname', '') 
+                
+                full_state_name = get_state_name(state_abbr, '').lower()
+                fname_clean, lname_clean = normalize_voteview_bioname(bioname)
+                
+                if icpsr and full_state_name and (fname_clean or lname_clean):
+                    icpsr_lookup[icpsr] = (fname_clean, lname_clean, full_state_name)
         print(f"Loaded {len(icpsr_lookup)} ICPSR-to-Name mappings.")
     except FileNotFoundError: print(f"Error: Member file not found at '{member_filepath}'"); raise
     except Exception as e: print(f"Error reading member file: {e}"); raise
@@ -135,15 +200,14 @@ def load_rollcall_lookup(vote_folder_path):
     rollcall_files = sorted([f for f in os.listdir(vote_folder_path) if f.startswith('HS') and f.endswith('_rollcalls.json')])
     if not rollcall_files: print(f"Error: No '*_rollcalls.json' files found in '{vote_folder_path}'"); raise FileNotFoundError
     
+    get_bill_id = bill_db_lookup.get # Bound once; looked up for every roll call
     for filename in rollcall_files:
         filepath = os.path.join(vote_folder_path, filename)
         print(f"  Reading {filename}...")
         try:
-            with open(filepath, 'r', encoding='utf-8') as f: data = json.load(f)
+            with open(filepath, 'rb') as f: data = json_loads(f.read())
             for roll_call in data:
-                bill_number = roll_call.get('bill_number')
-                bill_key = str(bill_number or '').strip().lower().replace(" ", "").replace(".", "")
-                bill_id = bill_db_lookup.get(bill_key)
+                bill_id = get_bill_id(normalize_bill_key(roll_call.get('bill_number')))
                 if bill_id:
                     key = (roll_call.get('congress'), roll_call.get('rollnumber'), roll_call.get('chamber'))
                     rollcall_lookup[key] = bill_id
@@ -151,28 +215,62 @@ def load_rollcall_lookup(vote_folder_path):
     print(f"Loaded {len(rollcall_lookup)} roll calls linked to enacted bills.")
 
 def find_politician_id(icpsr):
-    """Matches Voteview icpsr to our politician_db_lookup."""
+    """Matches Voteview icpsr to our politician lookups: a unique (lastname, state) wins, else the full name must match."""
     key_parts = icpsr_lookup.get(icpsr)
     if not key_parts: return None
     fname_clean, lname_clean, state_clean = key_parts
-    db_key = (lname_clean, state_clean)
-    potential_matches = politician_db_lookup.get(db_key)
-    if not potential_matches: return None
-    if len(potential_matches) == 1: return potential_matches[0][0]
-    else:
-        for pid, fname_db_clean in potential_matches:
-            if fname_clean == fname_db_clean: return pid
-    return None
+    return politician_lname_lookup.get((lname_clean, state_clean)) or politician_full_lookup.get(key_parts)
+
+def build_icpsr_politician_lookup():
+    """Resolves every ICPSR member to a PoliticianID once, so the vote loop needs a single dict lookup per record."""
+    global icpsr_politician_lookup
+    for icpsr in icpsr_lookup:
+        politician_id = find_politician_id(icpsr)
+        if politician_id: icpsr_politician_lookup[icpsr] = politician_id
+    print(f"Matched {len(icpsr_politician_lookup)} of {len(icpsr_lookup)} ICPSR members to politicians.")
+
+def init_vote_worker(rollcalls, icpsr_politicians):
+    """Hands each worker process the two match lookups once, instead of pickling them per file."""
+    global rollcall_lookup, icpsr_politician_lookup
+    rollcall_lookup = rollcalls; icpsr_politician_lookup = icpsr_politicians
+
+def match_vote_file(filepath):
+    """Decodes one _votes.json in a worker process and matches its records to (PoliticianID, BillID, Vote) rows.
+    Returns (rows, number of records read, error message or None)."""
+    filename = os.path.basename(filepath)
+    try:
+        with open(filepath, 'rb') as f: data = json_loads(f.read())
+    except Exception as e: return [], 0, f"Error reading file {filename}: {e}. Skipping."
+    if not isinstance(data, list): return [], 0, f"Warning: Expected list in {filename}. Skipping."
+
+    # Bound once; the loop below runs for every vote record
+    get_vote_fields = itemgetter('congress', 'rollnumber', 'chamber', 'icpsr', 'cast_code')
+    get_bill_id = rollcall_lookup.get; get_politician_id = icpsr_politician_lookup.get; get_vote_string = VOTEVIEW_CODE_MAP.get
+    vote_rows = []; add_vote_row = vote_rows.append
+    for vote_record in data:
+        try: congress, rollnumber, chamber, icpsr, cast_code = get_vote_fields(vote_record)
+        except (KeyError, TypeError): continue # Record missing a field, or not an object at all
+        bill_id = get_bill_id((congress, rollnumber, chamber))
+        if not bill_id: continue
+        
+        politician_id = get_politician_id(icpsr)
+        vote_string = get_vote_string(cast_code)
+        
+        if politician_id and vote_string: add_vote_row((politician_id, bill_id, vote_string))
+    return vote_rows, len(data), None
 
 def process_and_insert_votes():
     """Reads _votes.json files, uses lookups, and batch inserts votes."""
-    conn = None; total_inserted_votes = 0; total_votes_processed = 0
+    conn = None; total_inserted_votes = 0; total_votes_processed = 0; indexes_rebuilt = False
     try:
         print("Connecting to Supabase..."); conn = psycopg2.connect(DB_CONNECTION_STRING)
         load_db_lookups(conn)
         load_icpsr_lookup(MEMBER_FILE_PATH)
+        build_icpsr_politician_lookup()
         load_rollcall_lookup(VOTE_DATA_FOLDER_PATH)
-        clear_votes_table(conn); cur = conn.cursor()
+        clear_votes_table(conn); create_votes_stage(conn); cur = conn.cursor()
+        # A failed load is simply re-run from scratch, so losing the last commit on a crash is harmless
+        cur.execute("SET synchronous_commit = off;")
         overall_start_time = time.time()
 
         vote_files = sorted([f for f in os.listdir(VOTE_DATA_FOLDER_PATH) if f.startswith('HS') and f.endswith('_votes.json')])
@@ -181,62 +279,53 @@ def process_and_insert_votes():
             
         print(f"Found {len(vote_files)} Voteview *votes* JSON files to process.")
         votes_to_batch_insert = []
+        # Rows already staged. A Votes row has no roll-call column, so repeats of the same
+        # (politician, bill, vote) are indistinguishable and are only shipped once.
+        staged_votes = set()
+        stage_vote = votes_to_batch_insert.append; mark_staged = staged_votes.add
+        # COPYs run on one background thread (psycopg2 releases the GIL while sending), so the next
+        # batch is matched while the previous one is on the wire. At most one COPY is in flight, and
+        # leaving the block waits for it, so an error never rolls back under a COPY still running.
+        pending_copy = None
+        with ThreadPoolExecutor(max_workers=1) as copier:
+            # Files are decoded and matched across CPU cores; map() yields them in file order, and this
+            # process alone de-duplicates and writes, so the connection stays on one thread at a time
+            filepaths = [os.path.join(VOTE_DATA_FOLDER_PATH, filename) for filename in vote_files]
+            with ProcessPoolExecutor(initializer=init_vote_worker, initargs=(rollcall_lookup, icpsr_politician_lookup)) as executor:
+                for filename, (vote_rows, records_read, error) in zip(vote_files, executor.map(match_vote_file, filepaths)):
+                    if error: print(error); continue
+                    total_votes_processed += records_read; file_votes_matched = 0
 
-        for filename in vote_files:
-            filepath = os.path.join(VOTE_DATA_FOLDER_PATH, filename)
-            print(f"\n--- Processing File: {filename} ---")
-            file_start_time = time.time(); file_votes_matched = 0
-            
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f: data = json.load(f)
-            except Exception as e: print(f"Error reading file {filename}: {e}. Skipping."); continue
-            if not isinstance(data, list): print(f"Warning: Expected list in {filename}. Skipping."); continue
-
-            print(f"Processing {len(data)} individual vote records...")
-            for i, vote_record in enumerate(data):
-                total_votes_processed += 1
-                if (i + 1) % 50000 == 0: print(f"  Processed {i+1}/{len(data)} records...", end='\r')
-
-                try:
-                    congress = vote_record.get('congress'); rollnumber = vote_record.get('rollnumber')
-                    chamber = vote_record.get('chamber'); icpsr = vote_record.get('icpsr')
-                    cast_code = vote_record.get('cast_code')
-
-                    rollcall_key = (congress, rollnumber, chamber)
-                    bill_id = rollcall_lookup.get(rollcall_key)
-                    if not bill_id: continue
-                    
-                    politician_id = find_politician_id(icpsr)
-                    vote_string = VOTEVIEW_CODE_MAP.get(cast_code)
-                    
-                    if politician_id and bill_id and vote_string:
-                        votes_to_batch_insert.append((politician_id, bill_id, vote_string))
+                    for vote_row in vote_rows:
+                        if vote_row in staged_votes: continue
+                        mark_staged(vote_row); stage_vote(vote_row)
                         file_votes_matched += 1
-                except: continue 
-
-                if len(votes_to_batch_insert) >= BATCH_SIZE:
-                    print(" " * 80, end='\r'); print(f"  Inserting batch of {len(votes_to_batch_insert)} votes...")
-                    sql_insert = "INSERT INTO Votes (PoliticianID, BillID, Vote) VALUES %s ON CONFLICT DO NOTHING;"
-                    try:
-                        execute_values(cur, sql_insert, votes_to_batch_insert, page_size=BATCH_SIZE)
-                        conn.commit(); total_inserted_votes += len(votes_to_batch_insert)
-                        votes_to_batch_insert = []
-                    except psycopg2.Error as db_err:
-                        print(f"\n  DB batch error: {db_err}. Rolling back."); conn.rollback(); cur = conn.cursor()
-                        votes_to_batch_insert = []
-            
+
+                        if len(votes_to_batch_insert) >= BATCH_SIZE:
+                            print(f"  Staging batch of {len(votes_to_batch_insert)} votes...")
+                            if pending_copy: pending_copy.result() # Also re-raises a failed COPY here
+                            pending_copy = copier.submit(copy_votes_batch, cur, votes_to_batch_insert)
+                            votes_to_batch_insert = []; stage_vote = votes_to_batch_insert.append
+
+                    print(f"--- {filename}: matched {file_votes_matched} votes from {records_read} records ---")
+
+            # Batches fill across file boundaries, so only the remainder of the last one is left over
             if votes_to_batch_insert:
-                print(" " * 80, end='\r'); print(f"  Inserting final batch of {len(votes_to_batch_insert)} votes...")
-                sql_insert = "INSERT INTO Votes (PoliticianID, BillID, Vote) VALUES %s ON CONFLICT DO NOTHING;"
-                try:
-                    execute_values(cur, sql_insert, votes_to_batch_insert, page_size=BATCH_SIZE)
-                    conn.commit(); total_inserted_votes += len(votes_to_batch_insert)
-                except psycopg2.Error as db_err:
-                    print(f"\n  DB final batch error: {db_err}. Rolling back."); conn.rollback(); cur = conn.cursor()
-
-            print(" " * 80, end='\r')
-            print(f"  Matched {file_votes_matched} votes in this file.")
-            print(f"--- Finished file {filename} in {time.time() - file_start_time:.2f}s ---")
+                print(f"  Staging final batch of {len(votes_to_batch_insert)} votes...")
+                if pending_copy: pending_copy.result()
+                pending_copy = copier.submit(copy_votes_batch, cur, votes_to_batch_insert)
+            if pending_copy: pending_copy.result()
+
+        # One INSERT moves every staged vote into Votes; the commit also drops votes_stage
+        print("\nMoving staged votes into Votes...")
+        cur.execute("INSERT INTO Votes (PoliticianID, BillID, Vote) SELECT PoliticianID, BillID, Vote FROM votes_stage ON CONFLICT DO NOTHING;")
+        total_inserted_votes = cur.rowcount; conn.commit(); print(f"Inserted {total_inserted_votes} votes.")
+        rebuild_votes_indexes(conn); indexes_rebuilt = True
+
+        # VACUUM also sets the visibility map, without which the covering indexes still visit the heap
+        print("Vacuuming and updating planner statistics..."); conn.commit(); conn.autocommit = True
+        cur.execute("VACUUM ANALYZE Votes;"); conn.autocommit = False
+        flush_api_cache() # Every Votes row was replaced
 
         print(f"\n--- OVERALL SUCCESS ---")
         print(f"Processed {total_votes_processed} individual vote records from {len(vote_files)} files.")
@@ -251,6 +340,10 @@ def process_and_insert_votes():
         if conn:
             try: cur.close()
             except: pass
+            # Never leave Votes without its indexes, even when the load failed part-way
+            if not indexes_rebuilt and not conn.closed:
+                try: conn.rollback(); rebuild_votes_indexes(conn)
+                except Exception: pass # rebuild_votes_indexes already reported it
             conn.close(); print("Database connection closed.")
 
 if __name__ == "__main__":